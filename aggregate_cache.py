@@ -0,0 +1,32 @@
+import hashlib
+import json
+import os
+
+from lru_cache import LRUCache
+
+# How many per-question results the dashboard keeps (about 20 per filter selection)
+MAX_CACHED_AGGREGATES = int(os.environ.get("AGGREGATE_CACHE_SIZE", "256"))
+
+# How many rendered charts (PNG bytes, about 20 per filter selection) are kept
+MAX_CACHED_CHARTS = int(os.environ.get("CHART_CACHE_SIZE", "128"))
+
+
+# Function to hash a filter selection ({column: [values]}) so that the same filters
+# give the same key whatever order they were picked in; empty filters are ignored
+def selection_key(selections):
+    canonical = {column: sorted(map(str, values)) for column, values in selections.items() if values}
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Least-recently-used cache of computed results shared by every session, keyed by
+# (dataset key, selection_key(), question key). The dataset key changes with the
+# data, so stale results are never served; on_file_event also empties the cache
+# when a wave changes, so results for old data don't linger until evicted.
+class AggregateCache(LRUCache):
+    def __init__(self, max_entries=MAX_CACHED_AGGREGATES):
+        super().__init__(max_entries)
+
+    # Watch service callback: any new, changed or removed wave invalidates everything
+    def on_file_event(self, path, deleted=False):
+        self.clear()
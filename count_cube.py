@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+
+# Answer counts of every question column by filter cell, answer and wave. A filter
+# cell is one combination of filter values that occurs in the data (a few hundred
+# at most, however many respondents there are), so a filtered count table is a
+# masked sum over cells and never touches the rows.
+class CountCube:
+    def __init__(self, df, dimensions, columns):
+        self.key = None  # data version, set by whoever merges or persists the cube
+        self.dimensions = list(dimensions)
+        waves = df['source_file'].astype('category')
+        wave_codes = waves.cat.codes.to_numpy().astype(np.int64)
+        self.waves = list(waves.cat.categories)
+        n_waves = len(self.waves)
+
+        # Cell of each row: its combination of filter codes (0 = no value)
+        self.values = {}  # dimension -> {value: code}
+        combined = np.zeros(len(df), dtype=np.int64)
+        radices = []
+        for dimension in self.dimensions:
+            if dimension in df:
+                values = df[dimension].astype('category')
+            else:
+                # A wave without the filter column has no value for it in any row
+                values = pd.Series(pd.Categorical([None] * len(df)))
+            self.values[dimension] = {value: code for code, value in enumerate(values.cat.categories, start=1)}
+            radix = len(values.cat.categories) + 1
+            combined = combined * radix + (values.cat.codes.to_numpy().astype(np.int64) + 1)
+            radices.append(radix)
+        cells, cell_of_row = np.unique(combined, return_inverse=True)
+        n_cells = self.n_cells = len(cells)
+
+        # Filter codes of every cell, per dimension
+        self.cell_codes = {}
+        for dimension, radix in zip(reversed(self.dimensions), reversed(radices)):
+            self.cell_codes[dimension] = cells % radix
+            cells = cells // radix
+
+        self.counts = {}  # column -> (answers, cells x answers x waves counts)
+        for column in dict.fromkeys(columns):
+            if column not in df:
+                continue  # Not asked in these rows' wave(s); merge() leaves it out for them
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, labels = values.cat.codes.to_numpy(), values.cat.categories
+            else:
+                codes, labels = pd.factorize(values, sort=True)
+            answered = codes >= 0
+            n_answers = len(labels)
+            slots = (cell_of_row[answered] * n_answers + codes[answered].astype(np.int64)) * n_waves + wave_codes[answered]
+            counts = np.bincount(slots, minlength=n_cells * n_answers * n_waves).reshape(n_cells, n_answers, n_waves)
+            self.counts[column] = (list(labels), counts)
+
+    # Function to add up cubes built over different rows (e.g. one per wave) into
+    # one cube over all of them. Only the cubes are touched, never rows: values,
+    # answers and cells are matched by label, so each cube may have its own codes.
+    @classmethod
+    def merge(cls, cubes):
+        merged = cls.__new__(cls)
+        merged.key = None
+        merged.dimensions = list(cubes[0].dimensions)
+        merged.waves = list(dict.fromkeys(wave for cube in cubes for wave in cube.waves))
+        wave_positions = {wave: position for position, wave in enumerate(merged.waves)}
+
+        merged.values = {}
+        for dimension in merged.dimensions:
+            values = dict.fromkeys(value for cube in cubes for value in cube.values[dimension])
+            merged.values[dimension] = {value: code for code, value in enumerate(values, start=1)}
+
+        # Each cube's cells recoded into the merged value codes, then numbered together
+        combined = []
+        for cube in cubes:
+            codes = np.zeros(cube.n_cells, dtype=np.int64)
+            for dimension in merged.dimensions:
+                recode = np.zeros(len(cube.values[dimension]) + 1, dtype=np.int64)  # 0 stays "no value"
+                for value, code in cube.values[dimension].items():
+                    recode[code] = merged.values[dimension][value]
+                codes = codes * (len(merged.values[dimension]) + 1) + recode[cube.cell_codes[dimension]]
+            combined.append(codes)
+        cells, cell_of_cube_cell = np.unique(np.concatenate(combined), return_inverse=True)
+        merged.n_cells = len(cells)
+        cell_maps = np.split(cell_of_cube_cell, np.cumsum([len(codes) for codes in combined])[:-1])
+
+        merged.cell_codes = {}
+        for dimension in reversed(merged.dimensions):
+            radix = len(merged.values[dimension]) + 1
+            merged.cell_codes[dimension] = cells % radix
+            cells = cells // radix
+
+        merged.counts = {}
+        columns = dict.fromkeys(column for cube in cubes for column in cube.counts)
+        for column in columns:
+            labels = list(dict.fromkeys(label for cube in cubes if column in cube.counts for label in cube.counts[column][0]))
+            label_positions = {label: position for position, label in enumerate(labels)}
+            counts = np.zeros((merged.n_cells, len(labels), len(merged.waves)), dtype=np.int64)
+            for cube, cell_map in zip(cubes, cell_maps):
+                if column not in cube.counts:
+                    continue
+                cube_labels, cube_counts = cube.counts[column]
+                answer_map = np.array([label_positions[label] for label in cube_labels], dtype=np.int64)
+                wave_map = np.array([wave_positions[wave] for wave in cube.waves], dtype=np.int64)
+                # Cells, answers and waves are distinct within a cube, so += never collides
+                counts[np.ix_(cell_map, answer_map, wave_map)] += cube_counts
+            merged.counts[column] = (labels, counts)
+        return merged
+
+    # Function to get the filter cells as a small frame: one row per cell, one
+    # categorical column per dimension. The values each filter can take given the
+    # others are the same as on the respondent rows, so the sidebar filters can
+    # offer their options from it without loading any rows.
+    def cell_frame(self):
+        frame = pd.DataFrame({
+            dimension: pd.Categorical.from_codes(self.cell_codes[dimension] - 1, categories=list(self.values[dimension]))
+            for dimension in self.dimensions
+        })
+        # Lets the filter index be built once per data version
+        frame.attrs["dataset_key"] = self.key
+        return frame
+
+    # Function to get the cells a selection ({dimension: [values]}, empty = no
+    # filter) keeps, as a boolean array over the cells
+    def cell_mask(self, selections):
+        mask = np.ones(self.n_cells, dtype=bool)
+        for dimension, values in selections.items():
+            if not values:
+                continue
+            codes = [self.values[dimension][value] for value in values if value in self.values[dimension]]
+            mask &= np.isin(self.cell_codes[dimension], codes)
+        return mask
+
+    # Function to get count tables like question_engine.count_tables() on the
+    # filtered rows, from the cube alone. With by=<dimension> the counts are split
+    # by that dimension too, and the table columns become (segment, wave) pairs.
+    def count_tables(self, columns, selections, by=None):
+        mask = self.cell_mask(selections)
+        wave_labels = pd.Index(self.waves, dtype=object, name='source_file')
+        if by is not None:
+            segments = list(self.values[by])
+            # Cells x segments, so a single contraction splits every cell's counts by segment
+            membership = (self.cell_codes[by][:, None] == np.arange(1, len(segments) + 1)) & mask[:, None]
+            group_labels = pd.MultiIndex.from_product([segments, self.waves], names=[by, 'source_file'])
+
+        tables = {}
+        for column in dict.fromkeys(columns):
+            labels, counts = self.counts[column]
+            if by is None:
+                table = counts[mask].sum(axis=0)
+                table = pd.DataFrame(table, index=pd.Index(labels, dtype=object, name=column), columns=wave_labels)
+            else:
+                table = np.einsum('cs,caw->asw', membership.astype(np.int64), counts).reshape(len(labels), -1)
+                table = pd.DataFrame(table, index=pd.Index(labels, dtype=object, name=column), columns=group_labels)
+            tables[column] = table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+        return tables
+
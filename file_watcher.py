@@ -0,0 +1,229 @@
+import atexit
+import itertools
+import os
+import threading
+import time
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+from wave_catalog import ARRIVAL_QUIET_SECONDS, mark_wave_arrived
+
+# "native" uses inotify (or the platform's equivalent). "polling" compares stat
+# snapshots of the directory (names, sizes, mtimes, inodes) every few seconds,
+# for network shares and container mounts where native events don't arrive or
+# arrive in storms. Each poll costs one directory listing plus one stat per
+# entry, however large the files are.
+WATCH_MODE = os.environ.get("WAVE_WATCH_MODE", "native")
+POLL_INTERVAL_SECONDS = float(os.environ.get("WAVE_WATCH_POLL_SECONDS", "5"))
+
+
+# Watchdog Event Handler
+class FileChangeHandler(FileSystemEventHandler):
+    def __init__(self, app_callback):
+        super().__init__()
+        self.app_callback = app_callback
+
+    def on_created(self, event):
+        if event.src_path.endswith(".sav"):  # Trigger on new .sav files
+            self.app_callback(event.src_path)
+
+    def on_modified(self, event):
+        if event.src_path.endswith(".sav"):  # Trigger on modified .sav files
+            self.app_callback(event.src_path)
+
+    def on_deleted(self, event):
+        if event.src_path.endswith(".sav"):  # Trigger on removed .sav files
+            self.app_callback(event.src_path, deleted=True)
+
+    def on_moved(self, event):
+        if event.src_path.endswith(".sav"):  # A .sav file renamed away is gone
+            self.app_callback(event.src_path, deleted=True)
+        if event.dest_path.endswith(".sav"):  # Renamed into place, so already complete
+            self.app_callback(event.dest_path, complete=True)
+
+
+# Function to start Watchdog in a separate thread; the polling observer feeds the
+# same FileChangeHandler, so callers can't tell the two modes apart
+def start_watchdog(directory, callback, polling=False, poll_interval=POLL_INTERVAL_SECONDS):
+    event_handler = FileChangeHandler(callback)
+    observer = PollingObserver(timeout=poll_interval) if polling else Observer()
+    observer.schedule(event_handler, str(directory), recursive=False)
+    observer.start()
+    return observer
+
+
+# Sits between the raw watchdog events and the subscribers. A file that is still
+# being copied in fires on_modified over and over; this waits until its size and
+# mtime have stopped changing for quiet_period seconds (or it was renamed into
+# place) and then emits exactly one "wave ready" event for it.
+class WaveArrivalDebouncer:
+    def __init__(self, emit, quiet_period=ARRIVAL_QUIET_SECONDS, poll_interval=0.5):
+        self.emit = emit
+        self.quiet_period = quiet_period
+        self.poll_interval = poll_interval
+        self._pending = {}  # path -> ((size, mtime), time that stat was first seen)
+        self._emitted = {}  # path -> (size, mtime) of the last "ready" event
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @staticmethod
+    def _stat_key(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    # Handler callback, same signature as FileChangeHandler's app_callback
+    def on_event(self, path, deleted=False, complete=False):
+        if deleted:
+            with self._lock:
+                self._pending.pop(path, None)
+                self._emitted.pop(path, None)
+            self.emit(path, deleted=True)
+            return
+
+        if complete:
+            with self._lock:
+                self._pending.pop(path, None)
+            self._emit_ready(path)
+            return
+
+        with self._lock:
+            # Any event restarts the quiet period; the worker re-checks the stat
+            self._pending[path] = (None, time.monotonic())
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="wave-arrival-debouncer", daemon=True)
+                self._worker.start()
+
+    def _emit_ready(self, path):
+        try:
+            stat_key = self._stat_key(path)
+        except OSError:
+            return  # Gone again before it settled; the delete event says so
+        with self._lock:
+            if self._emitted.get(path) == stat_key:
+                return  # Nothing changed since the last "ready" event (e.g. a bare close)
+            self._emitted[path] = stat_key
+        try:
+            # Lets the wave catalog and store take it at once, without waiting out the quiet period
+            mark_wave_arrived(path)
+        except OSError:
+            return
+        self.emit(path)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            ready = []
+            with self._lock:
+                now = time.monotonic()
+                for path, (last_key, since) in list(self._pending.items()):
+                    try:
+                        stat_key = self._stat_key(path)
+                    except OSError:
+                        del self._pending[path]
+                        continue
+                    if stat_key != last_key:
+                        self._pending[path] = (stat_key, now)
+                    elif now - since >= self.quiet_period:
+                        del self._pending[path]
+                        ready.append(path)
+                if not self._pending and not ready:
+                    self._worker = None
+                    return
+            for path in ready:
+                self._emit_ready(path)
+
+    def cancel(self):
+        with self._lock:
+            self._pending.clear()
+
+
+# One watchdog observer per directory for the whole server process. Sessions and
+# services subscribe callback(path, deleted=False) to it instead of starting their
+# own observer; the observer runs while there is at least one subscriber.
+# Subscribers only hear about a file once it has finished arriving.
+class WatchService:
+    def __init__(self, directory, quiet_period=ARRIVAL_QUIET_SECONDS, polling=None):
+        self.directory = Path(directory)
+        self.polling = WATCH_MODE == "polling" if polling is None else polling
+        self._subscribers = {}  # token -> callback
+        self._tokens = itertools.count(1)
+        self._observer = None
+        self._debouncer = WaveArrivalDebouncer(self._dispatch, quiet_period=quiet_period)
+        self._lock = threading.Lock()
+
+    # Function to register a callback; returns a token for unsubscribe()
+    def subscribe(self, callback):
+        with self._lock:
+            token = next(self._tokens)
+            self._subscribers[token] = callback
+            if self._observer is None:
+                self._observer = start_watchdog(self.directory, self._debouncer.on_event, polling=self.polling)
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+            observer = self._detach_observer() if not self._subscribers else None
+        self._stop_observer(observer)
+
+    # Called from the watchdog thread: hand the event to every subscriber
+    def _dispatch(self, path, deleted=False):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+
+        for callback in subscribers:
+            try:
+                callback(path, deleted=deleted)
+            except Exception:
+                # One failing subscriber must not stop the others from hearing about it
+                pass
+
+    # Function to take the observer out of the service; called with the lock held
+    def _detach_observer(self):
+        observer, self._observer = self._observer, None
+        return observer
+
+    # Function to stop a detached observer. Called without the lock: the observer
+    # thread may be dispatching an event, which needs the lock to finish, so
+    # joining it while holding the lock would never return.
+    def _stop_observer(self, observer):
+        if observer is None:
+            return
+        self._debouncer.cancel()
+        observer.stop()
+        # The last subscriber can go away during a dispatch, i.e. on the observer thread
+        if observer is not threading.current_thread():
+            observer.join()
+
+    def stop(self):
+        with self._lock:
+            self._subscribers.clear()
+            observer = self._detach_observer()
+        self._stop_observer(observer)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+# Function to get the process-wide watch service for a directory
+def get_watch_service(directory):
+    directory = Path(directory).resolve()
+    with _services_lock:
+        service = _services.get(directory)
+        if service is None:
+            service = WatchService(directory)
+            _services[directory] = service
+        return service
+
+
+# Stop every observer when the server process exits
+@atexit.register
+def stop_all_watch_services():
+    with _services_lock:
+        services = list(_services.values())
+    for service in services:
+        service.stop()
@@ -0,0 +1,66 @@
+import numpy as np
+import streamlit as st
+from streamlit_dynamic_filters import DynamicFilters
+
+from lru_cache import LRUCache
+
+# How many filter indexes (one per data version) are kept
+MAX_FILTER_INDEXES = 4
+
+
+# One boolean row mask per (filter column, value), built once per frame from the
+# categorical codes. A filter selection then resolves to ORs within a column and
+# ANDs across columns of cached masks, without comparing any strings.
+class FilterIndex:
+    def __init__(self, df, columns):
+        self.row_count = len(df)
+        self.masks = {}  # column -> {value: boolean array over the rows}
+        for column in columns:
+            values = df[column].astype('category')
+            codes = values.cat.codes.to_numpy()
+            self.masks[column] = {value: codes == code for code, value in enumerate(values.cat.categories)}
+
+    # Function to get the row mask of a selection ({column: [values]}, empty = no
+    # filter), leaving out except_column. Returns None when nothing is filtered.
+    def mask(self, selections, except_column=None):
+        mask = None
+        for column, values in selections.items():
+            if column == except_column or not values:
+                continue
+            column_masks = self.masks[column]
+            selected = np.zeros(self.row_count, dtype=bool)
+            for value in values:
+                if value in column_masks:
+                    selected |= column_masks[value]
+            mask = selected if mask is None else mask & selected
+        return mask
+
+
+_indexes = LRUCache(MAX_FILTER_INDEXES)
+
+
+# Function to get the filter index of a frame, built once per data version (the
+# dataset key in df.attrs) and shared by sessions
+def get_filter_index(df, columns):
+    dataset_key = df.attrs.get("dataset_key")
+    if dataset_key is None:
+        return FilterIndex(df, columns)
+
+    key = (dataset_key, tuple(columns))
+    index = _indexes.get(key)
+    if index is None:
+        index = FilterIndex(df, columns)
+        _indexes.put(key, index)
+    return index
+
+
+# DynamicFilters that resolves its selections through the frame's FilterIndex
+# instead of re-filtering a copy of the whole frame for every filter on every rerun
+class IndexedDynamicFilters(DynamicFilters):
+    def __init__(self, df, filters, filters_name='filters'):
+        super().__init__(df, filters, filters_name)
+        self.index = get_filter_index(df, filters)
+
+    def filter_df(self, except_filter=None):
+        mask = self.index.mask(st.session_state[self.filters_name], except_filter)
+        return self.df if mask is None else self.df[mask]
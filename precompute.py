@@ -0,0 +1,112 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from wave_catalog import ARRIVAL_QUIET_SECONDS, build_wave_catalog
+
+logger = logging.getLogger(__name__)
+
+
+# Does the expensive work for a new wave off the request path: list the waves that
+# have arrived and run the registered warmers on them (building the new wave's
+# partial aggregates and the default view), so the first analyst to open the page
+# finds it ready. Once a run has finished with new data it publishes the waves it
+# warmed as `waves` and bumps `version`, which open dashboards poll to know when
+# to rerun. Sessions only show published waves, so they never do this work.
+class PrecomputePipeline:
+    def __init__(self, directory):
+        self.directory = directory
+        self.warmers = []  # callables taking the wave files, oldest first; return (file, error) pairs
+        self.waves = []  # WaveInfo of the published waves, oldest first
+        self.last_errors = []  # (file or directory, error) from the most recent run
+        self.version = 0  # data version published to sessions, only ever goes up
+        self._published_waves = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precompute")
+        self._queued = False
+        self._recheck = None  # timer of the run that looks again at waves still arriving
+        self._lock = threading.Lock()
+
+    # Function to register something to precompute whenever the waves change
+    def add_warmer(self, warmer):
+        self.warmers.append(warmer)
+
+    # Watch service callback: the work happens in the background, never on the
+    # watchdog thread
+    def on_file_event(self, path, deleted=False):
+        self.submit()
+
+    # Function to queue a warm-up run. Events arriving while one is still queued are
+    # folded into it, so a burst of new waves costs one run, not one per file.
+    def submit(self):
+        with self._lock:
+            if self._queued:
+                return
+            self._queued = True
+        self._executor.submit(self._run)
+
+    # Function to queue another run once the waves still arriving may have settled.
+    # Their files don't always fire another event (e.g. waves already there when
+    # the server starts), so the pipeline looks again itself.
+    def _recheck_later(self):
+        with self._lock:
+            if self._recheck is not None and self._recheck.is_alive():
+                return
+            self._recheck = threading.Timer(ARRIVAL_QUIET_SECONDS, self.submit)
+            self._recheck.daemon = True
+            self._recheck.start()
+
+    # The waves a run saw, by name, size and mtime: a new version is published when
+    # these change
+    @staticmethod
+    def _wave_stats(catalog):
+        stats = []
+        for wave in catalog:
+            try:
+                stat = wave.path.stat()
+            except OSError:
+                continue
+            stats.append((wave.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(stats)
+
+    def _run(self):
+        # Anything arriving from here on queues a new run
+        with self._lock:
+            self._queued = False
+
+        try:
+            catalog, errors = build_wave_catalog(self.directory)
+        except Exception as e:
+            # Nothing new to publish; sessions keep showing the waves they have
+            logger.warning("Could not list the waves in %s: %s", self.directory, e)
+            self.last_errors = [(self.directory, e)]
+            return
+
+        listed = {wave.path for wave in catalog} | {file for file, _ in errors}
+        arriving = any(file not in listed for file in Path(self.directory).glob("*.sav"))
+        if arriving:
+            self._recheck_later()
+
+        sav_files = [wave.path for wave in catalog]
+        if sav_files:
+            for warmer in list(self.warmers):
+                try:
+                    errors.extend(warmer(sav_files) or [])
+                except Exception as e:
+                    logger.exception("Precompute warmer %s failed", getattr(warmer, "__name__", warmer))
+                    errors.append((self.directory, e))
+        for source, error in errors:
+            logger.warning("Error loading file %s: %s", source, error)
+        self.last_errors = errors
+
+        # Publish only after the warm-up, so sessions rerun straight onto warm
+        # results, and leave out waves that failed, so no session retries them
+        failed = {source for source, _ in errors}
+        published = [wave for wave in catalog if wave.path not in failed]
+        if not published and arriving and self.version == 0:
+            return  # At server start every wave is new; they are listed once settled
+        waves = self._wave_stats(published)
+        if waves != self._published_waves:
+            self._published_waves = waves
+            self.waves = published
+            self.version += 1
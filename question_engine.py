@@ -0,0 +1,400 @@
+import io
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+
+# Function to count every answer by wave for many questions at once. Answers are
+# categorical, so each column is already small integer codes: one bincount over
+# (answer code, wave code) pairs per column replaces a groupby per chart.
+# Returns {column: counts (index=answers named after the column, columns=source
+# files)} with only the answers and waves that occur, like groupby(observed=True).
+# With by=<column> the counts are split by that column too, and the table columns
+# become (segment, source file) pairs.
+def count_tables(df, columns, by=None):
+    waves = df['source_file'].astype('category')
+    group_codes = waves.cat.codes.to_numpy().astype(np.int64)
+    group_labels = pd.Index(list(waves.cat.categories), dtype=object, name='source_file')
+    if by is not None:
+        segments = df[by].astype('category')
+        segment_codes = segments.cat.codes.to_numpy().astype(np.int64)
+        group_codes = np.where(segment_codes >= 0, segment_codes * len(group_labels) + group_codes, -1)
+        group_labels = pd.MultiIndex.from_product([list(segments.cat.categories), list(group_labels)], names=[by, 'source_file'])
+    n_groups = len(group_labels)
+
+    tables = {}
+    for column in dict.fromkeys(columns):
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, labels = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, labels = pd.factorize(values, sort=True)
+        answered = (codes >= 0) & (group_codes >= 0)  # -1 is a missing answer or segment
+        cells = codes[answered].astype(np.int64) * n_groups + group_codes[answered]
+        counts = np.bincount(cells, minlength=len(labels) * n_groups).reshape(len(labels), n_groups)
+
+        table = pd.DataFrame(counts, index=pd.Index(list(labels), dtype=object, name=column), columns=group_labels)
+        tables[column] = table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+    return tables
+
+
+# Function to compute the % of each answer per wave: answers (in the question's
+# order, combined answers merged into one row) by source file
+def distribution(question, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, [question.column])
+    counts = tables[question.column].drop(index=list(question.exclude), errors='ignore')
+    counts = counts.loc[:, counts.sum(axis=0) > 0]  # Waves left without any answer
+    percentages = counts.div(counts.sum(axis=0), axis=1) * 100
+
+    if question.order:
+        percentages = percentages.reindex(list(question.order))
+    for label, answers in question.combine.items():
+        # The combined row takes the place of the first answer it replaces
+        combined = percentages.reindex(list(answers)).sum(axis=0)
+        position = list(percentages.index).index(answers[0])
+        percentages = percentages.drop(list(answers))
+        rows = list(percentages.index)
+        rows.insert(position, label)
+        percentages = percentages.reindex(rows)
+        percentages.loc[label] = combined
+    return percentages
+
+
+# Function to compute, for every wave at once, the % of answers that fall in a box
+# (e.g. the top three points of a scale) from a count table
+def box_percentages(counts, answers):
+    in_box = counts.reindex(list(answers), fill_value=0).sum(axis=0)
+    return in_box / counts.sum(axis=0) * 100
+
+
+# Function to compute the % of answers in the question's top box per wave (out of
+# the respondents who answered, like the distribution)
+def top_box(question, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, [question.column])
+    counts = tables[question.column].drop(index=list(question.exclude), errors='ignore')
+    counts = counts.loc[:, counts.sum(axis=0) > 0]
+    return box_percentages(counts, question.top_box)
+
+
+# Function to compute n, mean and standard deviation per wave for a rating scale
+# from a count table, scoring the answers 1..N along the scale (lowest first).
+# Answers off the scale, such as "Don't know", are not scored.
+def score_stats(counts, scale):
+    scores = pd.Series(np.arange(1, len(scale) + 1, dtype=float), index=list(scale))
+    counts = counts.reindex(list(scale), fill_value=0)
+    n = counts.sum(axis=0)
+    total = counts.mul(scores, axis=0).sum(axis=0)
+    squares = counts.mul(scores ** 2, axis=0).sum(axis=0)
+
+    stats = pd.DataFrame({'n': n, 'mean': total / n})
+    # Sample standard deviation, from the sums alone
+    stats['std'] = np.sqrt((squares - total * stats['mean']) / (n - 1))
+    return stats[n > 0]
+
+
+# Function to compute the mean score per wave (with n and standard deviation),
+# scoring the answers 1..N along the question's order
+def mean(question, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, [question.column])
+    counts = tables[question.column].drop(index=list(question.exclude), errors='ignore')
+    return score_stats(counts, question.order)
+
+
+# z value of the NPS margin of error (95% confidence)
+NPS_CONFIDENCE_Z = 1.96
+
+
+# Function to compute the Net Promoter Score for every column of a count table
+# (waves, or segment and wave pairs): % promoters minus % detractors, with its
+# analytic margin of error, z * sqrt((p + d - (p - d)^2) / n)
+def nps_stats(counts, promoters, detractors):
+    n = counts.sum(axis=0)
+    p = counts.reindex(list(promoters), fill_value=0).sum(axis=0) / n
+    d = counts.reindex(list(detractors), fill_value=0).sum(axis=0) / n
+
+    stats = pd.DataFrame({
+        'n': n,
+        'promoters': p * 100,
+        'passives': (1 - p - d) * 100,
+        'detractors': d * 100,
+        'nps': (p - d) * 100,
+    })
+    stats['moe'] = NPS_CONFIDENCE_Z * np.sqrt((p + d - (p - d) ** 2) / n) * 100
+    return stats[n > 0]
+
+
+# Function to compute the NPS per wave: promoters are the question's top box,
+# detractors its bottom box, every other answer on the scale is a passive
+def nps(question, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, [question.column])
+    counts = tables[question.column].drop(index=list(question.exclude), errors='ignore')
+    if question.order:
+        counts = counts.reindex(list(question.order), fill_value=0)
+    return nps_stats(counts, question.top_box, question.bottom_box)
+
+
+# Function to compute the NPS per wave within each value of the given segment
+# columns (e.g. the active sidebar filters). The counts come from the rows of df,
+# or from a count cube sliced by the selections when one is given. Returns one
+# table indexed by (segment column, segment value, source file).
+def nps_by_segment(question, df, segments, cube=None, selections=None):
+    results = {}
+    for segment in segments:
+        if cube is not None:
+            counts = cube.count_tables([question.column], selections, by=segment)[question.column]
+        else:
+            counts = count_tables(df, [question.column], by=segment)[question.column]
+        counts = counts.drop(index=list(question.exclude), errors='ignore')
+        if question.order:
+            counts = counts.reindex(list(question.order), fill_value=0)
+        results[segment] = nps_stats(counts, question.top_box, question.bottom_box)
+    return pd.concat(results, names=['segment']) if results else pd.DataFrame()
+
+
+# Function to compute the top-box % of every cell of an importance/performance
+# grid, from the count tables of all its columns. Returns attributes by
+# (measure, source file), with measure "importance" or "performance".
+def grid(question, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, question.columns)
+    measures = {}
+    for position, measure in enumerate(("importance", "performance")):
+        rows = {}
+        for attribute, cells in question.grid.items():
+            counts = tables[cells[position]].drop(index=list(question.exclude), errors='ignore')
+            counts = counts.loc[:, counts.sum(axis=0) > 0]
+            rows[attribute] = box_percentages(counts, question.top_box)
+        measures[measure] = pd.DataFrame(rows).T
+    return pd.concat(measures, axis=1)
+
+
+# Answer of a ticked box in the checkbox batteries (the other one is "Unchecked")
+CHECKED_ANSWER = "Checked"
+
+
+# Function to turn the checkbox answers of every multi_select question into
+# True/False (missing stays missing), once, when the dataset is prepared
+def encode_checkboxes(df, questions):
+    columns = [column for question in questions if question.metric == "multi_select"
+               for column in question.columns if column in df.columns]
+    return df.assign(**{column: checked_matrix(df, [column])[column] for column in columns})
+
+
+# Function to get checkbox columns as a boolean matrix (True = checked, NA = not
+# asked); columns already encoded by encode_checkboxes are used as they are
+def checked_matrix(df, columns):
+    matrix = {}
+    for column in columns:
+        values = df[column]
+        if not pd.api.types.is_bool_dtype(values.dtype):
+            values = values.eq(CHECKED_ANSWER).astype("boolean").mask(values.isna())
+        matrix[column] = values
+    return pd.DataFrame(matrix, index=df.index)
+
+
+# Function to compute the % of respondents who checked each item of a battery per
+# wave, from the items' count tables (True/False once encoded by
+# encode_checkboxes, else the raw answers). Only respondents who were asked count.
+# Returns items (as labels, in the question's order) by source file, like a distribution.
+def multi_select(question, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, question.columns)
+    rows = {}
+    for column, label in question.items.items():
+        counts = tables[column]
+        checked = counts.reindex([True, CHECKED_ANSWER], fill_value=0).sum(axis=0)
+        rows[label] = checked / counts.sum(axis=0) * 100
+    percentages = pd.DataFrame(rows).T
+    percentages.columns = percentages.columns.astype(object)
+    return percentages
+
+
+# Metric name (Question.metric) -> function(question, df, tables=None) computing its
+# result; tables are count tables from count_tables() when the caller has them
+METRICS = {
+    "distribution": distribution,
+    "top_box": top_box,
+    "mean": mean,
+    "nps": nps,
+    "multi_select": multi_select,
+    "grid": grid,
+}
+
+# Function to list the columns whose count tables the given questions need (every
+# metric is computed from count tables)
+def counted_columns(questions):
+    return list(dict.fromkeys(column for question in questions for column in question.columns))
+
+
+# Function to compute the results of many questions: the count tables they need
+# come from one count_tables() call, unless the caller passes them in (e.g. sliced
+# from a count cube). Returns {question.key: result}.
+def compute_all(questions, df, tables=None):
+    if tables is None:
+        tables = count_tables(df, counted_columns(questions))
+    return {question.key: METRICS[question.metric](question, df, tables) for question in questions}
+
+
+# Function to give a chart the dashboard's look: no grid, no x ticks, only the left spine
+def style_axes(ax):
+    ax.set_xticks([])
+    ax.grid(False)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_visible(True)
+    ax.spines['bottom'].set_visible(False)
+
+
+# Function to draw a distribution as clustered horizontal bars, one bar per wave
+def draw_distribution(question, result):
+    # A Figure of its own (not pyplot's global one), so sessions can draw at the same time
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+    width = 0.2  # Adjust bar width for multiple files
+    positions = list(range(len(result.index)))
+
+    for i, col in enumerate(result.columns):
+        bars = ax.barh(
+            [pos + i * width for pos in positions],
+            result[col].fillna(0),
+            height=width,
+            label=col
+        )
+        for bar in bars:
+            ax.text(
+                bar.get_width() + 0.5,
+                bar.get_y() + bar.get_height() / 2,
+                f'{bar.get_width():.1f}%',
+                va='center',
+                ha='left'
+            )
+
+    ax.set_yticks(
+        [pos + (width * len(result.columns)) / 2 for pos in positions],
+        list(result.index)
+    )
+    if question.legend_outside:
+        # Place it fully outside the plot to the right
+        ax.legend(title="Source File", loc="upper left", bbox_to_anchor=(1.0, 0))
+    else:
+        ax.legend(title="Source File")
+    style_axes(ax)
+    return fig
+
+
+# Function to draw a per-wave result (top box or mean) as one horizontal bar per wave
+def draw_per_wave(question, result):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.barh([str(wave) for wave in result.index], result.fillna(0), color=question.color)
+
+    value_format = '{:.2f}' if question.metric == "mean" else '{:.1f}%'
+    for bar, value in zip(bars, result):
+        ax.text(
+            bar.get_width() + (0.1 if question.metric == "mean" else 1),  # Slightly beyond the bar's end
+            bar.get_y() + bar.get_height() / 2,  # Centered vertically
+            value_format.format(value) if pd.notna(value) else '',
+            va='center',
+            ha='left'
+        )
+    style_axes(ax)
+    return fig
+
+
+# Function to draw the mean scores of a score_stats() result
+def draw_mean(question, result):
+    return draw_per_wave(question, result['mean'])
+
+
+# Function to draw the NPS of each wave with its margin of error
+def draw_nps(question, result):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    waves = [str(wave) for wave in result.index]
+    ax.barh(waves, result['nps'], xerr=result['moe'], color=question.color, capsize=4)
+    ax.axvline(0, color='grey', linewidth=0.8)
+
+    for position, (score, moe) in enumerate(zip(result['nps'], result['moe'])):
+        ax.text(
+            max(score, 0) + moe + 1,  # Beyond the error bar
+            position,
+            f'{score:+.0f} ± {moe:.0f}',
+            va='center',
+            ha='left'
+        )
+    style_axes(ax)
+    return fig
+
+
+# Function to draw an importance/performance grid as one quadrant chart: a point
+# per attribute and wave, labelled for the latest wave, with the averages as the
+# quadrant lines
+def draw_grid(question, result):
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+    importance, performance = result['importance'], result['performance']
+    for wave in importance.columns:
+        ax.scatter(performance[wave], importance[wave], label=wave, s=60)
+
+    latest = importance.columns[-1]
+    for attribute in importance.index:
+        ax.annotate(
+            attribute,
+            (performance.loc[attribute, latest], importance.loc[attribute, latest]),
+            textcoords='offset points',
+            xytext=(6, 4),
+            fontsize=9
+        )
+
+    ax.axvline(performance.stack().mean(), color='grey', linestyle='--', linewidth=0.8)
+    ax.axhline(importance.stack().mean(), color='grey', linestyle='--', linewidth=0.8)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.legend(title="Source File")
+    return fig
+
+
+# Metric name -> function(question, result) drawing its chart
+CHARTS = {
+    "distribution": draw_distribution,
+    "top_box": draw_per_wave,
+    "mean": draw_mean,
+    "nps": draw_nps,
+    "multi_select": draw_distribution,
+    "grid": draw_grid,
+}
+
+
+# Function to draw a question's result as a matplotlib Figure
+def draw(question, result):
+    fig = CHARTS[question.metric](question, result)
+    ax = fig.axes[0]
+    ax.set_title(question.title)
+    ax.set_xlabel(question.xlabel)
+    ax.set_ylabel(question.ylabel)
+    fig.tight_layout()
+    return fig
+
+
+# Widest image Streamlit shows as it is (twice its 730 px content width); anything
+# wider is decoded, scaled down and re-encoded by st.image on every rerun
+MAX_CHART_WIDTH = 2 * 730
+
+# Padding savefig adds around a tight bounding box, in inches
+TIGHT_PAD_INCHES = 0.1
+
+
+# Function to render a chart as PNG bytes like st.pyplot does (cropped, 200 dpi),
+# but at a resolution that fits MAX_CHART_WIDTH, so the image can be cached and
+# shown with st.image as it is
+def render_png(fig, max_width=MAX_CHART_WIDTH):
+    width = fig.get_tightbbox().width + 2 * TIGHT_PAD_INCHES
+    dpi = min(200, (max_width - 1) / width)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", pad_inches=TIGHT_PAD_INCHES, dpi=dpi)
+    return buffer.getvalue()
@@ -0,0 +1,236 @@
+from dataclasses import dataclass, field
+
+# Sidebar filter variables and the names they are shown under (the dataset is
+# renamed to these when it is prepared, so questions and filters use the new names)
+FILTER_COLUMNS = {
+    "Q20A": "Gender",
+    "Q21": "Marital Status",
+    "Q23": "Number of People in Household",
+    "Q24": "Highest Level of Education",
+    "Q25": "Graduated with...",
+}
+
+# Attributes of the Q10/Q11 dealer grid, rated for importance (Q10, column c1) and
+# for the dealer's performance (Q11, column c2), in row order
+DEALER_ATTRIBUTES = (
+    "Overall reputation of the dealer",
+    "Salesperson's knowledge about your Roxor",
+    "Salesperson's ability to answer your questions",
+    "Variety of models to view prior to purchase",
+    "Dealer is conveniently located",
+    "Availability and responsiveness of the dealer",
+    "Roxor delivered in a timely manner",
+    "Dealer service and support capability",
+    "Cleanliness and layout of dealership",
+)
+
+# Answer scales shared by several questions, lowest to highest
+SATISFACTION_SCALE = ('1 (Very Dissatisfied)', '2', '3', '4', '5', '6', '7', '8', '9', '10 (Very Satisfied)')
+RECOMMEND_SCALE = ('1 (Definitely Would Not Recommend)', '2', '3', '4', '5', '6', '7', '8', '9', '10 (Definitely Would Recommend)')
+
+
+# One chart on the dashboard, described as data and drawn by question_engine.
+#   metric: "distribution" - % of each answer per wave, clustered bars in `order`
+#           "top_box"      - % of answers in `top_box` per wave
+#           "mean"         - mean of the answers scored 1..N along `order`, per wave
+#           "nps"          - % `top_box` (promoters) minus % `bottom_box` (detractors), per wave
+#           "multi_select" - % of respondents who checked each of `items` (a checkbox battery), per wave
+#           "grid"         - % `top_box` importance and performance of each attribute in `grid`, per wave
+@dataclass(frozen=True)
+class Question:
+    key: str  # unique name of the chart
+    column: str  # column in the prepared dataset
+    metric: str
+    header: str = None  # st.header above the chart (None: carries on under the previous one)
+    spacer: bool = False  # an empty st.header("") before the header, for breathing room
+    order: tuple = ()  # answer order (distribution) or rating scale, lowest first (mean)
+    top_box: tuple = ()  # answers counted by the top_box metric, e.g. SCALE[-3:] for a top-3 box
+    bottom_box: tuple = ()  # answers at the bottom of the scale (NPS detractors)
+    exclude: tuple = ()  # answers dropped before anything is counted, e.g. "Don't know"
+    combine: dict = field(default_factory=dict)  # label -> answers shown as one bar
+    title: str = ''
+    xlabel: str = ''
+    ylabel: str = ''
+    color: str = 'skyblue'
+    legend_outside: bool = False
+    items: dict = field(default_factory=dict)  # checkbox column -> label (multi_select)
+    grid: dict = field(default_factory=dict)  # attribute -> (importance column, performance column)
+
+    # Columns the chart reads: the battery's checkboxes, the grid's cells, or the question's column
+    @property
+    def columns(self):
+        if self.items:
+            return list(self.items)
+        if self.grid:
+            return [column for pair in self.grid.values() for column in pair]
+        return [self.column]
+
+
+QUESTIONS = [
+    Question(
+        "Q1", "Q1", "distribution",
+        header="How did you originally become aware of ROXOR?",
+        order=('All other', 'Previous ownership, experience, knowledge', 'Article in trade magazine', 'Research, shopping', 'Sponsorship of event', 'Saw a floor model at a show', 'Online', 'Friend or family member recommended them', 'Dealer signage and displayed product', 'Advertisements (TV, Print, Radio or Web)'),
+    ),
+    Question(
+        "Q2", "Q2", "distribution",
+        header="How would you rate your overall satisfaction with your ROXOR?",
+        order=SATISFACTION_SCALE,
+    ),
+    Question(
+        "Q2_top_box", "Q2", "top_box",
+        header="How would you rate your overall satisfaction with your ROXOR?",
+        top_box=SATISFACTION_SCALE[-3:],
+        title='Sum of Ratings of 8, 9, or 10 – Extremely Satisfied',
+    ),
+    Question(
+        "Q2_mean", "Q2", "mean",
+        order=SATISFACTION_SCALE,
+        title='Average Ratings',
+        color='lightgreen',
+    ),
+    Question(
+        "Q4A", "Q4A", "top_box",
+        header="Have you had any issues with product or performance quality?", spacer=True,
+        top_box=('Yes',),
+    ),
+    Question(
+        "Q5", "Q5", "distribution",
+        header="How likely would you be to recommend ROXOR to a friend or colleague?", spacer=True,
+        order=RECOMMEND_SCALE,
+        combine={'5 or less': RECOMMEND_SCALE[:5]},
+        title='Dynamic Clustered Bar Chart for Q5 (Including Aggregated "5 or less")',
+    ),
+    Question(
+        "Q5_top_box", "Q5", "top_box",
+        header="INSERT How likely would you be to recommend ROXOR to a friend or colleague?",
+        top_box=RECOMMEND_SCALE[-3:],
+        title='Percentage of "Definitely Would Recommend" Responses (8, 9, 10)',
+        xlabel='Percentage',
+    ),
+    Question(
+        "Q5_nps", "Q5", "nps",
+        header="Net Promoter Score", spacer=True,
+        order=RECOMMEND_SCALE,
+        top_box=RECOMMEND_SCALE[-2:],  # Promoters: 9 and 10
+        bottom_box=RECOMMEND_SCALE[:6],  # Detractors: 6 or less
+        title='NPS by wave (± 95% margin of error)',
+    ),
+    Question(
+        "Q7", "Q7", "distribution",
+        header="What is your primary use of your new ROXOR?", spacer=True,
+        order=('Public Sector/Government', 'Commercial use (landscaping, mowing highways, construction, etc)', 'Income producing agricultural use such as farming or ranching', 'Rural Lifestyle such as hobby farming or recreational'),
+        legend_outside=True,
+    ),
+    Question(
+        "Q9", "Q9", "multi_select",
+        header="What are the primary reasons you choose ROXOR over other brands you considered?", spacer=True,
+        items={
+            'Q9_1': "Product Features",
+            'Q9_2': "Price",
+            'Q9_3': "Warranty Offered",
+            'Q9_4': "Good Value",
+            'Q9_5': "Easy to Operate and Maintain",
+            'Q9_6': "Performance",
+            'Q9_7': "Availability of Services and Parts",
+            'Q9_8': "Dealer Reputation",
+            'Q9_9': "Online Research",
+            'Q9_10': "Brand Reputation",
+            'Q9_11': "Financing",
+            'Q9_12': "Recommendation",
+            'Q9_13': "Current Mahindra Owner",
+            'Q9_14': "Special offers and Promotions",
+            'Q9_15': "Other Mention",
+        },
+        title='Percentage of "Checked" Responses for Q9_1 to Q9_15',
+    ),
+    Question(
+        "Q10Q11", "Q10Q11", "grid",
+        header="Importance Comparison (Top 2 Box Scoring)", spacer=True,
+        grid={
+            attribute: (f"Q10Q11_r{row}_c1", f"Q10Q11_r{row}_c2")
+            for row, attribute in enumerate(DEALER_ATTRIBUTES, start=1)
+        },
+        top_box=('9', '10 (Extremely Important)', '10 (Excellent)'),
+        exclude=("Don't know",),
+        title='Importance vs. Performance (% Top 2 Box, dashed lines at the averages)',
+        xlabel='Performance: % rating the dealer 9 or 10 (Excellent)',
+        ylabel='Importance: % rating 9 or 10 (Extremely Important)',
+    ),
+    Question(
+        "Q12", "Q12", "distribution",
+        header="Overall, how satisfied are you with your dealer experience?",
+        order=SATISFACTION_SCALE,
+        combine={'5 or less': SATISFACTION_SCALE[:5]},
+        title='Dynamic Clustered Bar Chart for Q5 (Including Aggregated "5 or less")',
+    ),
+    Question(
+        "Q12_top_box", "Q12", "top_box",
+        header="Overall, how satisfied are you with your dealer experience?", spacer=True,
+        top_box=SATISFACTION_SCALE[-3:],
+        exclude=("Don't know",),
+        title='Percentage of Valid Responses for Q12: 8, 9, and 10 (Very Satisfied)',
+        xlabel='Percentage of Valid Responses (%)', ylabel='Source File',
+    ),
+    Question(
+        "Q12_mean", "Q12", "mean",
+        header="Overall, how satisfied are you with your dealer experience?",
+        order=SATISFACTION_SCALE,
+        exclude=("Don't know",),
+        title='Mean Value of Responses for Q12',
+        xlabel='Mean Value of Responses', ylabel='Source File',
+    ),
+    Question(
+        "Q16", "Q16", "multi_select",
+        header="INSERT Since purchasing your ROXOR, have you visited the dealer for any of the following reasons?", spacer=True,
+        items={
+            'Q16_1': "Routine maintenance/service",
+            'Q16_2': "Parts",
+            'Q16_3': "Tractor implement purchase",
+            'Q16_4': "Tractor operational question",
+            'Q16_5': "Warranty issue/repair",
+            'Q16_6': "Merchandise and wearables",
+            'Q16_7': "Other Mention",
+            'Q16_8': "None, have not visited dealer",
+        },
+        title='Percentage of "Checked" Responses for Q16',
+    ),
+    Question(
+        "Q18", "Q18", "distribution",
+        header="Please rate your dealer experience when returning to the dealer. Would you say it was a(n) [_____] experience?", spacer=True,
+        order=('Poor', 'Fair', 'Neutral', 'Good', 'Excellent'),
+        exclude=('Don’t Know',),
+    ),
+    Question(
+        "Gender", "Gender", "distribution",
+        header="Gender", spacer=True,
+        order=('Female', 'Male'),
+    ),
+    Question(
+        "Age", "QD", "distribution",
+        header="Age", spacer=True,
+        order=('75 or older', '65 - 74', '55 - 64', '45 - 54', '35 - 44', '25 - 34', '18 - 24'),
+        exclude=('Prefer not to answer',),
+    ),
+    Question(
+        "Ethnicity", "QE", "distribution",
+        header="Ethnicity", spacer=True,
+        order=('Prefer not to answer', 'Other', 'Hispanic', 'Asian', 'African American or Black', 'Caucasian or White'),
+        exclude=('Prefer not to answer',),
+    ),
+    Question(
+        "Marital Status", "Marital Status", "distribution",
+        header="Marital Status", spacer=True,
+        order=('Refused', 'Other', 'Widowed', 'Divorced', 'Single', 'Married'),
+        exclude=('Prefer not to answer',),
+    ),
+]
+
+
+# Function to list the .sav variables the registry needs (filter columns included),
+# mapping renamed filter columns back to their names in the files
+def source_columns(questions=QUESTIONS):
+    renamed = {shown: raw for raw, shown in FILTER_COLUMNS.items()}
+    columns = [renamed.get(column, column) for question in questions for column in question.columns]
+    columns += list(FILTER_COLUMNS)
+    return list(dict.fromkeys(columns))
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import pandas as pd
+import pyreadstat
+
+# Folder (next to the app) that holds one Parquet file per parsed wave
+CACHE_DIRECTORY = Path(__file__).resolve().parent / ".wave_cache"
+MANIFEST_FILE = "manifest.json"
+
+# Bump this whenever the way a wave is parsed changes, so old cache files are ignored
+CACHE_FORMAT_VERSION = 2
+
+# Number of worker processes used to parse waves that are not cached yet (1 = no pool)
+DEFAULT_WORKERS = int(os.environ.get("SAV_LOADER_WORKERS", os.cpu_count() or 1))
+
+# Worker processes are started fresh (forkserver, or spawn where there is none,
+# e.g. Windows), never forked: the Streamlit server has threads of its own (the
+# web server, the file watcher, the precompute pipeline), and forking a
+# threaded process can deadlock the child on a lock held by one of them
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# How many parsed waves (one Parquet file per wave and column selection) are kept
+MAX_WAVE_CACHE_FILES = int(os.environ.get("WAVE_CACHE_FILES", "256"))
+
+
+# Function to write a cache file through write(temp_path) into a temp file next to
+# it, which then replaces it, so other sessions and processes never see half a
+# file. Everything under .wave_cache/ is an optimisation only, so a file that can't
+# be written is not an error: returns False and the caller carries on without it.
+def write_cache_file(path, write):
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write(temp_path)
+        os.replace(temp_path, path)
+        return True
+    except Exception:
+        try:
+            temp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return False
+
+
+# Function to read a cache file through read(path), or None if there is none or it
+# is unreadable (a broken file is deleted, so it gets rebuilt). A file that is read
+# is touched, which keeps it among the most recently used for prune_cache_files().
+def read_cache_file(path, read):
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        value = read(path)
+    except Exception:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return value
+
+
+# Function to delete all but the `keep` most recently used cache files matching a
+# glob pattern, so files of old waves, old settings and old code don't pile up
+def prune_cache_files(directory, pattern, keep):
+    def last_used(file):
+        try:
+            return file.stat().st_mtime
+        except OSError:
+            return 0  # Already deleted by another process
+
+    for old_file in sorted(Path(directory).glob(pattern), key=last_used, reverse=True)[keep:]:
+        try:
+            old_file.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+# Function to hash a file's contents in blocks (large deliveries never sit in memory)
+def file_content_hash(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to read the manifest that maps each .sav path to its size, mtime and hash
+def read_manifest(cache_directory):
+    try:
+        with open(Path(cache_directory) / MANIFEST_FILE, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+# Function to write the manifest (see write_cache_file); returns False on failure
+def write_manifest(cache_directory, manifest):
+    def write(temp_path):
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+
+    return write_cache_file(Path(cache_directory) / MANIFEST_FILE, write)
+
+
+# Content hashes are also memoised per (path, size, mtime), so reruns neither read
+# the manifest nor, when it can't be written (read-only cache), re-hash the waves
+_fingerprint_cache = {}
+_fingerprint_lock = threading.Lock()
+
+
+# Function to work out the content hash of a wave, re-hashing only if size or mtime changed
+def wave_fingerprint(file, cache_directory):
+    file = Path(file).resolve()
+    stat = file.stat()
+    key = (str(file), stat.st_size, stat.st_mtime_ns)
+    with _fingerprint_lock:
+        if key in _fingerprint_cache:
+            return _fingerprint_cache[key]
+
+    manifest = read_manifest(cache_directory)
+    entry = manifest.get(str(file))
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        content_hash = entry["sha256"]
+    else:
+        content_hash = file_content_hash(file)
+        manifest[str(file)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content_hash,
+        }
+        # Entries of waves that are gone would otherwise stay in the manifest for good
+        manifest = {path: entry for path, entry in manifest.items() if Path(path).exists()}
+        write_manifest(cache_directory, manifest)
+
+    with _fingerprint_lock:
+        # Drop entries for older versions of the same file
+        for old_key in [k for k in _fingerprint_cache if k[0] == key[0]]:
+            del _fingerprint_cache[old_key]
+        _fingerprint_cache[key] = content_hash
+    return content_hash
+
+
+# Function to pick the variables of a wave matching a list of column names,
+# where a name ending in "*" matches every variable starting with that prefix
+def resolve_columns(file, columns):
+    _, meta = pyreadstat.read_sav(str(file), metadataonly=True)
+    exact = {column for column in columns if not column.endswith("*")}
+    prefixes = tuple(column[:-1] for column in columns if column.endswith("*"))
+    return [
+        name for name in meta.column_names
+        if name in exact or (prefixes and name.startswith(prefixes))
+    ]
+
+
+# Short, stable tag for a column selection, so each projection gets its own cache file
+def columns_tag(columns):
+    if columns is None:
+        return "all"
+    joined = "\n".join(sorted(columns))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:12]
+
+
+# Function to find the cache file for a wave (the file may not exist yet)
+def cache_file_for(file, cache_directory=CACHE_DIRECTORY, columns=None):
+    cache_directory = Path(cache_directory)
+    try:
+        cache_directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        # No cache (e.g. a read-only app folder): the wave is parsed every time instead
+        pass
+    content_hash = wave_fingerprint(file, cache_directory)
+    return cache_directory / f"{content_hash}-v{CACHE_FORMAT_VERSION}-{columns_tag(columns)}.parquet"
+
+
+# Function to read a cached wave, returns None if there is no usable cache file
+def read_wave_cache_file(cache_file):
+    return read_cache_file(cache_file, pd.read_parquet)
+
+
+# Function to give every labelled variable a Categorical holding all of its value
+# labels in SPSS code order, not just the answers that happen to occur in this wave
+def apply_label_categories(df, value_labels):
+    for column, labels in value_labels.items():
+        if column not in df:
+            continue
+        categories = list(dict.fromkeys(labels[code] for code in sorted(labels)))
+        # Keep any unlabelled values that do occur, so nothing turns into NaN
+        known = set(categories)
+        extra = [value for value in df[column].dropna().unique() if value not in known]
+        df[column] = pd.Categorical(df[column], categories=categories + extra)
+    return df
+
+
+# Function to parse a .sav file and store the result in the cache.
+# With columns given, only the matching variables are read from the file.
+def parse_and_cache(file, cache_file, columns=None):
+    if columns is None:
+        df = pd.read_spss(file)
+    else:
+        df = pd.read_spss(file, usecols=resolve_columns(file, columns))
+    df = apply_label_categories(df, df.attrs.get("variable_value_labels", {}))
+
+    # read_spss keeps the SPSS metadata in df.attrs, which Parquet can't store as JSON
+    to_cache = df.copy(deep=False)
+    to_cache.attrs = {}
+    if write_cache_file(cache_file, lambda temp_file: to_cache.to_parquet(temp_file, index=False)):
+        prune_cache_files(cache_file.parent, "*.parquet", MAX_WAVE_CACHE_FILES)
+    return df
+
+
+# Runs in a worker process: errors are returned instead of raised so one bad
+# wave doesn't cancel the others
+def parse_wave(file, cache_file, columns=None):
+    try:
+        return parse_and_cache(file, cache_file, columns), None
+    except Exception as e:
+        return None, e
+
+
+# Function to load several waves, parsing cache misses in parallel worker processes.
+# Returns (file, DataFrame or None, error or None) tuples in the same order as sav_files.
+def load_waves(sav_files, workers=None, columns=None, cache_directory=CACHE_DIRECTORY):
+    if workers is None:
+        workers = DEFAULT_WORKERS
+
+    results = {}
+    to_parse = []
+    for file in sav_files:
+        try:
+            cache_file = cache_file_for(file, cache_directory, columns)
+        except Exception as e:
+            results[file] = (None, e)
+            continue
+        df = read_wave_cache_file(cache_file)
+        if df is not None:
+            results[file] = (df, None)
+        else:
+            to_parse.append((file, cache_file))
+
+    # Only start a pool when there is more than one file to parse, a single file
+    # is faster to parse in-process than to pickle back from a worker
+    if workers > 1 and len(to_parse) > 1:
+        context = multiprocessing.get_context(WORKER_START_METHOD)
+        with ProcessPoolExecutor(max_workers=min(workers, len(to_parse)), mp_context=context) as pool:
+            files, cache_files = zip(*to_parse)
+            parsed = pool.map(parse_wave, files, cache_files, repeat(columns))
+            for (file, _), result in zip(to_parse, parsed):
+                results[file] = result
+    else:
+        for file, cache_file in to_parse:
+            results[file] = parse_wave(file, cache_file, columns)
+
+    return [(file, *results[file]) for file in sav_files]
+
+
+# Rows read per chunk by the streaming reader, which bounds memory for huge waves
+STREAM_CHUNK_ROWS = 100_000
+
+
+# Function to read a wave in chunks of rows without ever holding the whole file.
+# Each chunk is parsed like parse_and_cache() parses a whole wave (the same
+# variables, labelled answers as categoricals), so anything computed per chunk
+# and added up matches what the whole wave gives.
+def read_sav_chunks(file, columns=None, chunksize=STREAM_CHUNK_ROWS):
+    usecols = None if columns is None else resolve_columns(file, columns)
+    reader = pyreadstat.read_file_in_chunks(
+        pyreadstat.read_sav, str(file), chunksize=chunksize,
+        usecols=usecols, apply_value_formats=True,
+    )
+    for chunk, meta in reader:
+        yield apply_label_categories(chunk, meta.variable_value_labels)
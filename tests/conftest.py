@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyreadstat
+import pytest
+
+# The app's modules live at the repository root, next to streamlit_app.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+# Function to write a small wave with labelled answers, as the survey tool does
+def _write_wave(path, rows=120, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Gender": rng.choice([1.0, 2.0, np.nan], rows),
+        "Rating": rng.choice([1.0, 2.0, 3.0, 4.0, 5.0, np.nan], rows),
+    })
+    labels = {
+        "Gender": {1.0: "Female", 2.0: "Male"},
+        "Rating": {float(code): str(code) for code in range(1, 6)},
+    }
+    pyreadstat.write_sav(df, str(path), variable_value_labels=labels)
+    return path
+
+
+@pytest.fixture
+def write_wave():
+    return _write_wave
@@ -0,0 +1,27 @@
+from aggregate_cache import AggregateCache, selection_key
+from lru_cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "entries": 2, "max_entries": 2}
+
+
+def test_aggregate_cache_empties_on_wave_events():
+    cache = AggregateCache(max_entries=4)
+    cache.put(("dataset", "selection", "Q1"), "result")
+    cache.on_file_event("Quarters/new.sav")
+    assert cache.get(("dataset", "selection", "Q1")) is None
+
+
+def test_selection_key_ignores_order_and_empty_filters():
+    key = selection_key({"Gender": ["Male", "Female"], "Region": ["North"]})
+    assert key == selection_key({"Region": ["North"], "Gender": ["Female", "Male"], "Age": []})
+    assert key != selection_key({"Gender": ["Male"], "Region": ["North"]})
+    assert selection_key({}) == selection_key({"Gender": []})
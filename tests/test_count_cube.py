@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from count_cube import CountCube
+from question_engine import compute_all, count_tables, counted_columns
+from questions import Question
+
+DIMENSIONS = ["Gender", "Region"]
+SCALE = ('1', '2', '3', '4', '5')
+QUESTIONS = [
+    Question(key="rating", column="Rating", metric="distribution", order=SCALE),
+    Question(key="rating_top", column="Rating", metric="top_box", top_box=SCALE[-2:]),
+    Question(key="rating_mean", column="Rating", metric="mean", order=SCALE),
+    Question(key="recommend", column="Recommend", metric="nps", top_box=SCALE[-1:], bottom_box=SCALE[:3]),
+]
+SELECTIONS = [
+    {},
+    {"Gender": ["Female"]},
+    {"Gender": ["Male"], "Region": ["North", "South"]},
+    {"Region": ["East"]},
+]
+
+
+# Function to make one wave's rows: random answers, some of them missing, and
+# categories that differ from wave to wave (Region "East" is only in the second,
+# so the same region has different codes in the two waves)
+def make_wave(name, rows, seed, regions):
+    rng = np.random.default_rng(seed)
+    rating = rng.choice(list(SCALE) + [None], rows)
+    return pd.DataFrame({
+        "source_file": name,
+        "Gender": pd.Categorical(rng.choice(["Female", "Male", None], rows)),
+        "Region": pd.Categorical(rng.choice(regions, rows)),
+        "Rating": pd.Categorical(rating, categories=sorted(set(rating) - {None})),
+        "Recommend": rng.choice(list(SCALE), rows),
+    })
+
+
+@pytest.fixture
+def waves():
+    return [
+        make_wave("wave1.sav", 200, 1, ["North", "South"]),
+        make_wave("wave2.sav", 300, 2, ["South", "North", "East"]),
+    ]
+
+
+# Function to filter the rows the way the sidebar does
+def filter_rows(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in selections.items():
+        if values:
+            mask &= df[column].isin(values).to_numpy()
+    return df[mask]
+
+
+def assert_same_tables(left, right):
+    assert left.keys() == right.keys()
+    for column in left:
+        pd.testing.assert_frame_equal(
+            left[column].sort_index().sort_index(axis=1), right[column].sort_index().sort_index(axis=1),
+            check_dtype=False, check_names=False,
+        )
+
+
+def test_merged_cube_equals_cube_on_concatenated_frame(waves):
+    columns = ["Rating", "Recommend"]
+    merged = CountCube.merge([CountCube(wave, DIMENSIONS, columns) for wave in waves])
+    whole = CountCube(pd.concat(waves, ignore_index=True), DIMENSIONS, columns)
+
+    assert merged.waves == whole.waves
+    assert merged.n_cells == whole.n_cells
+    for selections in SELECTIONS:
+        assert_same_tables(merged.count_tables(columns, selections), whole.count_tables(columns, selections))
+        for by in DIMENSIONS:
+            assert_same_tables(
+                merged.count_tables(columns, selections, by=by), whole.count_tables(columns, selections, by=by),
+            )
+
+
+def test_merge_keeps_columns_missing_from_some_waves(waves):
+    first, second = waves
+    merged = CountCube.merge([
+        CountCube(first.drop(columns="Recommend"), DIMENSIONS, ["Rating", "Recommend"]),
+        CountCube(second, DIMENSIONS, ["Rating", "Recommend"]),
+    ])
+    table = merged.count_tables(["Recommend"], {})["Recommend"]
+    assert list(table.columns) == ["wave2.sav"]
+    assert table.to_numpy().sum() == len(second)
+
+
+def test_cube_results_match_row_based_results(waves):
+    df = pd.concat(waves, ignore_index=True)
+    cube = CountCube.merge([CountCube(wave, DIMENSIONS, counted_columns(QUESTIONS)) for wave in waves])
+    for selections in SELECTIONS:
+        rows = filter_rows(df, selections)
+        assert_same_tables(
+            cube.count_tables(counted_columns(QUESTIONS), selections), count_tables(rows, counted_columns(QUESTIONS)),
+        )
+
+        from_cube = compute_all(QUESTIONS, None, cube.count_tables(counted_columns(QUESTIONS), selections))
+        from_rows = compute_all(QUESTIONS, rows)
+        for question in QUESTIONS:
+            expected, actual = from_rows[question.key], from_cube[question.key]
+            if isinstance(expected, pd.Series):
+                pd.testing.assert_series_equal(actual, expected, check_dtype=False, check_names=False)
+            else:
+                pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_names=False)
+
+
+def test_cell_frame_offers_the_values_of_the_rows(waves):
+    df = pd.concat(waves, ignore_index=True)
+    cube = CountCube.merge([CountCube(wave, DIMENSIONS, []) for wave in waves])
+    cells = cube.cell_frame()
+    for dimension in DIMENSIONS:
+        assert set(cells[dimension].dropna()) == set(df[dimension].dropna())
+    female = cells[cells["Gender"] == "Female"]
+    assert set(female["Region"].dropna()) == set(df.loc[df["Gender"] == "Female", "Region"].dropna())
@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+
+from file_watcher import WaveArrivalDebouncer
+
+QUIET_PERIOD = 0.3
+
+
+# Collects the events a debouncer emits
+class Events:
+    def __init__(self):
+        self.events = []
+        self.ready = threading.Event()
+
+    def __call__(self, path, deleted=False):
+        self.events.append((path, deleted))
+        self.ready.set()
+
+
+def make_debouncer():
+    events = Events()
+    return WaveArrivalDebouncer(events, quiet_period=QUIET_PERIOD, poll_interval=0.05), events
+
+
+def test_one_ready_event_once_writes_stop(tmp_path):
+    debouncer, events = make_debouncer()
+    wave = tmp_path / "wave.sav"
+    for i in range(5):
+        with open(wave, "ab") as f:
+            f.write(b"x" * 100)
+        debouncer.on_event(str(wave))
+        time.sleep(QUIET_PERIOD / 5)
+    assert events.events == []  # Still arriving
+
+    assert events.ready.wait(QUIET_PERIOD * 10)
+    time.sleep(QUIET_PERIOD * 2)
+    assert events.events == [(str(wave), False)]
+
+
+def test_complete_emits_at_once(tmp_path):
+    debouncer, events = make_debouncer()
+    wave = tmp_path / "wave.sav"
+    wave.write_bytes(b"x")
+    debouncer.on_event(str(wave), complete=True)
+    assert events.events == [(str(wave), False)]
+
+
+def test_unchanged_file_is_not_emitted_again(tmp_path):
+    debouncer, events = make_debouncer()
+    wave = tmp_path / "wave.sav"
+    wave.write_bytes(b"x")
+    debouncer.on_event(str(wave), complete=True)
+    debouncer.on_event(str(wave), complete=True)
+    assert events.events == [(str(wave), False)]
+
+    wave.write_bytes(b"xy")
+    os.utime(wave, ns=(time.time_ns(), time.time_ns() + 10**9))
+    debouncer.on_event(str(wave), complete=True)
+    assert events.events == [(str(wave), False), (str(wave), False)]
+
+
+def test_deleted_passes_straight_through(tmp_path):
+    debouncer, events = make_debouncer()
+    wave = tmp_path / "wave.sav"
+    wave.write_bytes(b"x")
+    debouncer.on_event(str(wave))
+    wave.unlink()
+    debouncer.on_event(str(wave), deleted=True)
+    assert events.events == [(str(wave), True)]
+
+    time.sleep(QUIET_PERIOD * 2)
+    assert events.events == [(str(wave), True)]  # The pending arrival was dropped
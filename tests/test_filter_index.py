@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from filter_index import FilterIndex, get_filter_index
+
+COLUMNS = ["Gender", "Region"]
+
+
+def make_rows(rows=500, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Gender": pd.Categorical(rng.choice(["Female", "Male", None], rows)),
+        "Region": rng.choice(["North", "South", "East"], rows),  # plain text, not categorical
+    })
+
+
+# Function to filter the rows the way DynamicFilters does, comparing every value
+def isin_mask(df, selections, except_column=None):
+    mask = None
+    for column, values in selections.items():
+        if column != except_column and values:
+            selected = df[column].isin(values).to_numpy()
+            mask = selected if mask is None else mask & selected
+    return mask
+
+
+def test_mask_matches_isin():
+    df = make_rows()
+    index = FilterIndex(df, COLUMNS)
+    for selections in [
+        {"Gender": ["Female"]},
+        {"Gender": ["Female", "Male"], "Region": ["North"]},
+        {"Region": ["South", "East"], "Gender": []},
+        {"Region": ["Nowhere"]},
+    ]:
+        for except_column in (None, "Region"):
+            expected = isin_mask(df, selections, except_column)
+            actual = index.mask(selections, except_column)
+            if expected is None:
+                assert actual is None
+            else:
+                np.testing.assert_array_equal(actual, expected)
+
+
+def test_mask_is_none_without_filters():
+    index = FilterIndex(make_rows(), COLUMNS)
+    assert index.mask({}) is None
+    assert index.mask({"Gender": [], "Region": []}) is None
+    assert index.mask({"Gender": ["Male"]}, except_column="Gender") is None
+
+
+def test_index_is_shared_per_dataset_key():
+    df = make_rows()
+    df.attrs["dataset_key"] = "test-dataset"
+    assert get_filter_index(df, COLUMNS) is get_filter_index(df.copy(deep=False), COLUMNS)
+    assert get_filter_index(make_rows(), COLUMNS) is not get_filter_index(make_rows(), COLUMNS)
@@ -0,0 +1,94 @@
+import precompute
+from precompute import PrecomputePipeline
+from wave_catalog import WaveInfo
+
+
+# Function to make a catalog of waves that exist on disk (their stats are published)
+def make_catalog(tmp_path, names):
+    catalog = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b"x")
+        catalog.append(WaveInfo(path=path, study=None, wave_date=None, row_count=1))
+    return catalog
+
+
+# Function to run the pipeline once, in this thread, on the given catalog
+def run(pipeline, monkeypatch, catalog, errors=()):
+    monkeypatch.setattr(precompute, "build_wave_catalog", lambda directory: (list(catalog), list(errors)))
+    pipeline._run()
+
+
+def test_publishes_warmed_waves_once(tmp_path, monkeypatch):
+    pipeline = PrecomputePipeline(tmp_path)
+    warmed = []
+    pipeline.add_warmer(warmed.append)
+    catalog = make_catalog(tmp_path, ["1.sav", "2.sav"])
+
+    run(pipeline, monkeypatch, catalog)
+    assert pipeline.version == 1
+    assert pipeline.waves == catalog
+    assert warmed == [[wave.path for wave in catalog]]
+
+    run(pipeline, monkeypatch, catalog)
+    assert pipeline.version == 1  # Same waves: nothing new for sessions
+
+
+def test_failed_scan_keeps_the_published_waves(tmp_path, monkeypatch):
+    pipeline = PrecomputePipeline(tmp_path)
+    catalog = make_catalog(tmp_path, ["1.sav"])
+    run(pipeline, monkeypatch, catalog)
+
+    def failing_scan(directory):
+        raise OSError("share unavailable")
+
+    monkeypatch.setattr(precompute, "build_wave_catalog", failing_scan)
+    pipeline._run()
+    assert pipeline.version == 1
+    assert pipeline.waves == catalog
+    assert [str(error) for _, error in pipeline.last_errors] == ["share unavailable"]
+
+
+def test_waves_that_fail_to_warm_are_not_published(tmp_path, monkeypatch):
+    pipeline = PrecomputePipeline(tmp_path)
+    catalog = make_catalog(tmp_path, ["1.sav", "2.sav"])
+    error = ValueError("broken wave")
+    pipeline.add_warmer(lambda sav_files: [(catalog[1].path, error)])
+
+    run(pipeline, monkeypatch, catalog)
+    assert pipeline.waves == catalog[:1]
+    assert pipeline.last_errors == [(catalog[1].path, error)]
+
+
+def test_warmer_exception_is_reported(tmp_path, monkeypatch):
+    pipeline = PrecomputePipeline(tmp_path)
+
+    def failing_warmer(sav_files):
+        raise RuntimeError("out of memory")
+
+    pipeline.add_warmer(failing_warmer)
+    run(pipeline, monkeypatch, make_catalog(tmp_path, ["1.sav"]))
+    assert [(source, str(error)) for source, error in pipeline.last_errors] == [(tmp_path, "out of memory")]
+
+
+def test_looks_again_at_waves_still_arriving(tmp_path, monkeypatch):
+    pipeline = PrecomputePipeline(tmp_path)
+    catalog = make_catalog(tmp_path, ["1.sav"])
+    (tmp_path / "2.sav").write_bytes(b"x")  # Not listed yet: still arriving
+    submitted = []
+    monkeypatch.setattr(precompute, "ARRIVAL_QUIET_SECONDS", 0.05)
+    monkeypatch.setattr(pipeline, "submit", lambda: submitted.append(True))
+
+    run(pipeline, monkeypatch, catalog)
+    pipeline._recheck.join()
+    assert submitted == [True]
+    assert pipeline.waves == catalog
+
+
+def test_nothing_is_published_while_every_wave_is_settling(tmp_path, monkeypatch):
+    pipeline = PrecomputePipeline(tmp_path)
+    (tmp_path / "1.sav").write_bytes(b"x")
+    monkeypatch.setattr(pipeline, "_recheck_later", lambda: None)
+
+    run(pipeline, monkeypatch, [])
+    assert pipeline.version == 0
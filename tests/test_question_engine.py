@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from count_cube import CountCube
+from question_engine import (
+    NPS_CONFIDENCE_Z, count_tables, encode_checkboxes, grid, multi_select, nps, nps_by_segment, nps_stats,
+    score_stats,
+)
+from questions import Question
+
+SCALE = ('1', '2', '3', '4', '5')
+
+
+# Function to make a count table (answers by wave) from lists of answers per wave
+def counts_of(answers_by_wave):
+    return pd.DataFrame({
+        wave: pd.Series(answers, dtype=object).value_counts() for wave, answers in answers_by_wave.items()
+    }).fillna(0).astype(int)
+
+
+def test_score_stats_match_the_scores():
+    answers = {"a.sav": ['1', '5', '5', '4', "Don't know"], "b.sav": ['3', '3', '2']}
+    stats = score_stats(counts_of(answers), SCALE)
+    for wave, wave_answers in answers.items():
+        scores = np.array([SCALE.index(answer) + 1 for answer in wave_answers if answer in SCALE], dtype=float)
+        assert stats.loc[wave, 'n'] == len(scores)  # "Don't know" isn't scored
+        assert np.isclose(stats.loc[wave, 'mean'], scores.mean())
+        assert np.isclose(stats.loc[wave, 'std'], scores.std(ddof=1))
+
+
+def test_score_stats_leave_out_waves_without_answers():
+    stats = score_stats(counts_of({"a.sav": ['2', '4'], "b.sav": ["Don't know"]}), SCALE)
+    assert list(stats.index) == ["a.sav"]
+
+
+def test_nps_and_margin_of_error():
+    # 10 answers: 5 promoters (9, 10), 3 passives (7, 8), 2 detractors (0-6)
+    counts = counts_of({"a.sav": ['10', '10', '9', '9', '9', '8', '7', '7', '6', '1']})
+    stats = nps_stats(counts, promoters=('9', '10'), detractors=tuple(map(str, range(7))))
+    row = stats.loc["a.sav"]
+    assert row['n'] == 10
+    assert np.isclose(row['promoters'], 50) and np.isclose(row['passives'], 30) and np.isclose(row['detractors'], 20)
+    assert np.isclose(row['nps'], 30)
+    assert np.isclose(row['moe'], NPS_CONFIDENCE_Z * np.sqrt((0.5 + 0.2 - 0.3 ** 2) / 10) * 100)
+
+
+def test_nps_leaves_out_excluded_answers_and_empty_waves():
+    question = Question(
+        "nps", "Q5", "nps", order=SCALE, top_box=SCALE[-1:], bottom_box=SCALE[:3], exclude=("Don't know",),
+    )
+    tables = {"Q5": counts_of({"a.sav": ['5', '5', '1', '4', "Don't know"], "b.sav": ["Don't know"]})}
+    stats = nps(question, None, tables)
+    assert list(stats.index) == ["a.sav"]
+    assert stats.loc["a.sav", 'n'] == 4
+    assert np.isclose(stats.loc["a.sav", 'nps'], 25)
+
+
+def test_nps_by_segment_from_cube_matches_rows():
+    rng = np.random.default_rng(4)
+    rows = 300
+    df = pd.DataFrame({
+        "source_file": rng.choice(["a.sav", "b.sav"], rows),
+        "Gender": pd.Categorical(rng.choice(["Female", "Male", None], rows)),
+        "Q5": pd.Categorical(rng.choice(list(SCALE), rows)),
+    })
+    question = Question("nps", "Q5", "nps", order=SCALE, top_box=SCALE[-1:], bottom_box=SCALE[:3])
+    cube = CountCube(df, ["Gender"], ["Q5"])
+    pd.testing.assert_frame_equal(
+        nps_by_segment(question, None, ["Gender"], cube, {}), nps_by_segment(question, df, ["Gender"]),
+        check_dtype=False,
+    )
+
+
+# Q9-style battery: a was asked of everyone, b skipped by one respondent (missing)
+BATTERY = Question("Q9", "Q9", "multi_select", items={"Q9_1": "Price", "Q9_2": "Dealer"})
+BATTERY_ROWS = pd.DataFrame({
+    "source_file": ["a.sav"] * 4 + ["b.sav"] * 2,
+    "Q9_1": ["Checked", "Unchecked", "Checked", "Checked", "Unchecked", "Unchecked"],
+    "Q9_2": ["Checked", None, "Unchecked", "Unchecked", "Checked", "Checked"],
+})
+
+
+def test_multi_select_counts_only_respondents_asked():
+    result = multi_select(BATTERY, BATTERY_ROWS)
+    assert list(result.index) == ["Price", "Dealer"]
+    assert np.isclose(result.loc["Price", "a.sav"], 75) and np.isclose(result.loc["Price", "b.sav"], 0)
+    assert np.isclose(result.loc["Dealer", "a.sav"], 100 / 3) and np.isclose(result.loc["Dealer", "b.sav"], 100)
+
+
+def test_multi_select_same_once_encoded():
+    encoded = encode_checkboxes(BATTERY_ROWS, [BATTERY])
+    assert encoded["Q9_1"].dtype == "boolean"
+    assert encoded["Q9_2"].isna().sum() == 1
+    pd.testing.assert_frame_equal(multi_select(BATTERY, encoded), multi_select(BATTERY, BATTERY_ROWS))
+    tables = count_tables(encoded, BATTERY.columns)
+    pd.testing.assert_frame_equal(multi_select(BATTERY, None, tables), multi_select(BATTERY, BATTERY_ROWS))
+
+
+def test_grid_top_box_per_attribute_and_measure():
+    question = Question(
+        "Q10Q11", "Q10Q11", "grid",
+        grid={"Reputation": ("r1_c1", "r1_c2"), "Location": ("r2_c1", "r2_c2")},
+        top_box=('9', '10 (Extremely Important)', '10 (Excellent)'),
+        exclude=("Don't know",),
+    )
+    df = pd.DataFrame({
+        "source_file": ["a.sav"] * 4,
+        "r1_c1": ['10 (Extremely Important)', '9', '3', "Don't know"],
+        "r1_c2": ['10 (Excellent)', '8', '8', '8'],
+        "r2_c1": ['1', '2', '9', '9'],
+        "r2_c2": ["Don't know", "Don't know", '9', '5'],
+    })
+    result = grid(question, df)
+    assert list(result.index) == ["Reputation", "Location"]
+    assert np.isclose(result.loc["Reputation", ("importance", "a.sav")], 200 / 3)  # "Don't know" left out
+    assert np.isclose(result.loc["Reputation", ("performance", "a.sav")], 25)
+    assert np.isclose(result.loc["Location", ("importance", "a.sav")], 50)
+    assert np.isclose(result.loc["Location", ("performance", "a.sav")], 50)
@@ -0,0 +1,83 @@
+import pandas as pd
+
+import sav_loader
+from sav_loader import cache_file_for, load_waves, wave_fingerprint
+
+
+# Function to count the content hashes worked out from here on
+def count_hashes(monkeypatch):
+    hashed = []
+    original = sav_loader.file_content_hash
+
+    def counting_hash(path, *args, **kwargs):
+        hashed.append(path)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(sav_loader, "file_content_hash", counting_hash)
+    return hashed
+
+
+def test_cache_file_is_keyed_by_content_and_columns(tmp_path, write_wave):
+    cache = tmp_path / "cache"
+    wave = write_wave(tmp_path / "1 wave.sav", seed=1)
+    cache_file = cache_file_for(wave, cache)
+    assert cache_file == cache_file_for(wave, cache)
+    assert cache_file != cache_file_for(wave, cache, columns=["Rating"])
+
+    write_wave(wave, seed=2)  # A new delivery under the same name
+    assert cache_file_for(wave, cache) != cache_file
+
+
+def test_second_load_comes_from_the_cache(tmp_path, write_wave, monkeypatch):
+    cache = tmp_path / "cache"
+    wave = write_wave(tmp_path / "1 wave.sav")
+    [(_, parsed, error)] = load_waves([wave], workers=1, cache_directory=cache)
+    assert error is None
+    assert list(cache.glob("*.parquet")) == [cache_file_for(wave, cache)]
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(sav_loader, "parse_and_cache", no_parsing)
+    [(_, cached, error)] = load_waves([wave], workers=1, cache_directory=cache)
+    assert error is None
+    pd.testing.assert_frame_equal(cached, parsed)
+
+
+def test_broken_cache_file_is_rebuilt(tmp_path, write_wave):
+    cache = tmp_path / "cache"
+    wave = write_wave(tmp_path / "1 wave.sav")
+    [(_, parsed, _)] = load_waves([wave], workers=1, cache_directory=cache)
+    cache_file_for(wave, cache).write_bytes(b"not parquet")
+
+    [(_, reloaded, error)] = load_waves([wave], workers=1, cache_directory=cache)
+    assert error is None
+    pd.testing.assert_frame_equal(reloaded, parsed)
+    pd.testing.assert_frame_equal(pd.read_parquet(cache_file_for(wave, cache)), parsed, check_dtype=False)
+
+
+def test_unwritable_cache_still_loads_and_hashes_once(tmp_path, write_wave, monkeypatch):
+    cache = tmp_path / "cache"
+    cache.write_text("a file, so nothing can be written under it")
+    wave = write_wave(tmp_path / "1 wave.sav")
+    hashed = count_hashes(monkeypatch)
+
+    for _ in range(3):
+        [(_, df, error)] = load_waves([wave], workers=1, cache_directory=cache)
+        assert error is None
+        assert len(df) == 120
+    assert len(hashed) == 1  # Memoised although the manifest can't be written
+
+    write_wave(wave, seed=5)
+    wave_fingerprint(wave, cache)
+    assert len(hashed) == 2
+
+
+def test_waves_parse_in_worker_processes(tmp_path, write_wave):
+    cache = tmp_path / "cache"
+    waves = [write_wave(tmp_path / f"{number} wave.sav", seed=number) for number in (1, 2, 3)]
+    results = load_waves(waves, workers=2, cache_directory=cache)
+    assert [error for _, _, error in results] == [None, None, None]
+    for (file, df, _), wave in zip(results, waves):
+        assert file == wave
+        pd.testing.assert_frame_equal(df, load_waves([wave], workers=1, cache_directory=cache)[0][1])
@@ -0,0 +1,66 @@
+import os
+import time
+from datetime import date
+
+from wave_catalog import build_wave_catalog, mark_wave_arrived, parse_wave_name, wave_has_arrived
+
+QUIET_PERIOD = 0.2
+DAY_NS = 24 * 3600 * 10**9
+
+
+# Function to write a wave file with an mtime skewed by the given offset, as a file
+# server whose clock is off would
+def write_skewed(path, data, offset_ns):
+    path.write_bytes(data)
+    mtime = time.time_ns() + offset_ns
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_settled_wave_arrives_after_quiet_period(tmp_path):
+    wave = tmp_path / "wave.sav"
+    write_skewed(wave, b"x" * 10, DAY_NS)  # Server clock a day ahead
+    assert not wave_has_arrived(wave, QUIET_PERIOD)  # First seen
+    time.sleep(QUIET_PERIOD)
+    assert wave_has_arrived(wave, QUIET_PERIOD)
+    assert wave_has_arrived(wave, QUIET_PERIOD)
+
+
+def test_wave_still_growing_has_not_arrived(tmp_path):
+    wave = tmp_path / "wave.sav"
+    write_skewed(wave, b"x" * 10, -DAY_NS)  # Server clock a day behind
+    assert not wave_has_arrived(wave, QUIET_PERIOD)
+    time.sleep(QUIET_PERIOD)
+    write_skewed(wave, b"x" * 20, -DAY_NS)
+    assert not wave_has_arrived(wave, QUIET_PERIOD)  # Changed: the quiet period starts over
+    time.sleep(QUIET_PERIOD)
+    assert wave_has_arrived(wave, QUIET_PERIOD)
+
+
+def test_wave_marked_by_the_watcher_has_arrived(tmp_path):
+    wave = tmp_path / "wave.sav"
+    wave.write_bytes(b"x")
+    mark_wave_arrived(wave)
+    assert wave_has_arrived(wave, QUIET_PERIOD)
+
+    write_skewed(wave, b"xy", 0)  # Replaced by a new delivery
+    assert not wave_has_arrived(wave, QUIET_PERIOD)
+
+
+def test_parse_wave_name():
+    assert parse_wave_name("9738 November 2024.sav") == ("9738", date(2024, 11, 1))
+    assert parse_wave_name("Quarters/9790 Jun 2024.sav") == ("9790", date(2024, 6, 1))
+    assert parse_wave_name(" 9790  June 2024 .sav") == ("9790", date(2024, 6, 1))
+    assert parse_wave_name("9790 Smarch 2024.sav") == ("9790", None)
+    assert parse_wave_name("export final.sav") == (None, None)
+
+
+def test_catalog_lists_waves_oldest_first(tmp_path, write_wave):
+    names = ["9738 November 2024.sav", "notes.sav", "9790 June 2024.sav", "9700 Jan 2025.sav"]
+    for name in names:
+        mark_wave_arrived(write_wave(tmp_path / name))
+    catalog, errors = build_wave_catalog(tmp_path)
+    assert errors == []
+    assert [wave.name for wave in catalog] == [
+        "9790 June 2024.sav", "9738 November 2024.sav", "9700 Jan 2025.sav", "notes.sav",
+    ]
+    assert catalog[0].row_count == 120
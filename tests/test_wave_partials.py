@@ -0,0 +1,109 @@
+import functools
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import wave_partials
+from count_cube import CountCube
+from sav_loader import read_sav_chunks
+from wave_catalog import read_wave_info
+from wave_partials import WavePartials
+from wave_store import WaveStore
+
+DIMENSIONS = ["Gender"]
+COLUMNS = ["Rating"]
+
+
+# Two delivered waves, with partials kept out of the app's cache
+@pytest.fixture
+def waves(tmp_path, monkeypatch, write_wave):
+    monkeypatch.setattr(wave_partials, "PARTIALS_DIRECTORY", tmp_path / "partials")
+    monkeypatch.setattr("wave_store.wave_has_arrived", lambda file: True)
+    quarters = tmp_path / "Quarters"
+    quarters.mkdir()
+    return [write_wave(quarters / f"{number} wave.sav", 120, number) for number in (1, 2)]
+
+
+def test_overlapping_builds_parse_each_wave_once(waves):
+    store = WaveStore()
+    partials = WavePartials(store, DIMENSIONS, COLUMNS)
+
+    frames = []
+    original_frame = store.frame
+
+    def slow_frame(sav_files):
+        frames.append(sav_files)
+        time.sleep(0.2)
+        return original_frame(sav_files)
+
+    store.frame = slow_frame
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(partials.cube(waves))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [errors for _, errors in results] == [[], []]
+    assert len(frames) == len(waves)
+    first, second = (cube for cube, _ in results)
+    pd.testing.assert_frame_equal(first.count_tables(COLUMNS, {})["Rating"], second.count_tables(COLUMNS, {})["Rating"])
+
+
+# Function to clear the case count in a wave's header (offset 80), as some
+# tools that write .sav files do
+def clear_case_count(path):
+    with open(path, "r+b") as f:
+        f.seek(80)
+        f.write((-1).to_bytes(4, "little", signed=True))
+
+
+def test_streamed_partials_equal_loaded_partials(waves, tmp_path, monkeypatch):
+    columns = DIMENSIONS + COLUMNS
+    loaded, errors = WavePartials(WaveStore(columns=columns), DIMENSIONS, COLUMNS).cube(waves)
+    assert errors == []
+
+    monkeypatch.setattr(wave_partials, "PARTIALS_DIRECTORY", tmp_path / "streamed")
+    monkeypatch.setattr(wave_partials, "STREAM_WAVE_ROWS", 0)
+    monkeypatch.setattr(wave_partials, "read_sav_chunks", functools.partial(read_sav_chunks, chunksize=7))
+    store = WaveStore(columns=columns)
+    streamed, errors = WavePartials(store, DIMENSIONS, COLUMNS).cube(waves)
+    assert errors == []
+    assert store._partitions == {}  # Never loaded whole
+
+    for selections in [{}, {"Gender": ["Female"]}]:
+        for by in (None, "Gender"):
+            pd.testing.assert_frame_equal(
+                streamed.count_tables(COLUMNS, selections, by=by)["Rating"],
+                loaded.count_tables(COLUMNS, selections, by=by)["Rating"],
+            )
+
+
+def test_wave_without_case_count_is_streamed(waves, monkeypatch):
+    expected, _ = WavePartials(WaveStore(), DIMENSIONS, COLUMNS).cube(waves)
+    for wave in waves:
+        clear_case_count(wave)
+    assert read_wave_info(waves[0]).row_count is None
+
+    streamed = []
+    monkeypatch.setattr(wave_partials, "read_sav_chunks", lambda *args: streamed.append(args) or read_sav_chunks(*args))
+    monkeypatch.setattr(wave_partials, "PARTIALS_DIRECTORY", waves[0].parent / "partials")
+    cube, errors = WavePartials(WaveStore(), DIMENSIONS, COLUMNS).cube(waves)
+    assert errors == []
+    assert len(streamed) == len(waves)
+    pd.testing.assert_frame_equal(cube.count_tables(COLUMNS, {})["Rating"], expected.count_tables(COLUMNS, {})["Rating"])
+
+
+def test_partials_of_another_count_cube_are_not_reused(monkeypatch):
+    store = WaveStore()
+    tag = WavePartials(store, DIMENSIONS, COLUMNS)._tag
+
+    class ChangedCountCube(CountCube):
+        def __init__(self, df, dimensions, columns):
+            super().__init__(df, dimensions, columns)
+            self.totals = None
+
+    monkeypatch.setattr(wave_partials, "CountCube", ChangedCountCube)
+    assert WavePartials(store, DIMENSIONS, COLUMNS)._tag != tag
@@ -0,0 +1,149 @@
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+
+import pyreadstat
+
+# Wave files are named "<study number> <Month> <Year>.sav", e.g. "9738 November 2024.sav"
+WAVE_NAME_PATTERN = re.compile(r"^(?P<study>\d+)\s+(?P<month>[A-Za-z]+)\s+(?P<year>\d{4})$")
+
+
+# Everything the app needs to know about a wave, without its respondent data
+@dataclass
+class WaveInfo:
+    path: Path
+    study: str | None
+    wave_date: date | None
+    row_count: int | None  # None when the file's header doesn't record it
+    variables: list = field(default_factory=list)
+    value_labels: dict = field(default_factory=dict)
+
+    @property
+    def name(self):
+        return self.path.name
+
+    # Label shown in the app, e.g. "November 2024" (falls back to the file name)
+    @property
+    def period(self):
+        if self.wave_date is None:
+            return self.path.stem
+        return self.wave_date.strftime("%B %Y")
+
+
+# Function to get the study number and wave date (first of the month) from a file name
+def parse_wave_name(file_name):
+    match = WAVE_NAME_PATTERN.match(Path(file_name).stem.strip())
+    if match is None:
+        return None, None
+
+    month_year = f"{match['month']} {match['year']}"
+    for month_format in ("%B %Y", "%b %Y"):
+        try:
+            return match["study"], datetime.strptime(month_year, month_format).date()
+        except ValueError:
+            continue
+    return match["study"], None
+
+
+# Seconds a wave's size and mtime must stay unchanged before it counts as arrived;
+# a file still being copied into Quarters/ is left alone until then
+ARRIVAL_QUIET_SECONDS = float(os.environ.get("WAVE_ARRIVAL_QUIET_SECONDS", "2"))
+
+# (size, mtime) of each wave known to have finished arriving
+_arrived = {}
+# (size, mtime) of each wave still settling, and when this process first saw it so
+_settling = {}
+_arrived_lock = threading.Lock()
+
+
+# Function to record that a wave has finished arriving (called by the file watcher
+# once its size and mtime have settled, or it was renamed into place)
+def mark_wave_arrived(path):
+    file = Path(path).resolve()
+    stat = file.stat()
+    with _arrived_lock:
+        _arrived[str(file)] = (stat.st_size, stat.st_mtime_ns)
+        _settling.pop(str(file), None)
+
+
+# Function to tell whether a wave has finished arriving: the file watcher said so
+# for this exact size and mtime, or two checks at least quiet_period apart saw the
+# same size and mtime. Only this host's clock is used, never the mtime's time, so
+# a file server whose clock is off (network shares) can't make a half-copied wave
+# look finished or a finished one look new. A wave seen for the first time has
+# therefore not arrived yet; asking again after quiet_period tells.
+def wave_has_arrived(path, quiet_period=ARRIVAL_QUIET_SECONDS):
+    file = Path(path).resolve()
+    stat = file.stat()
+    stat_key = (stat.st_size, stat.st_mtime_ns)
+    now = time.monotonic()
+    with _arrived_lock:
+        if _arrived.get(str(file)) == stat_key:
+            return True
+        settling = _settling.get(str(file))
+        if settling is None or settling[0] != stat_key:
+            _settling[str(file)] = (stat_key, now)
+            if quiet_period > 0:
+                return False
+        elif now - settling[1] < quiet_period:
+            return False
+        _arrived[str(file)] = stat_key
+        _settling.pop(str(file), None)
+        return True
+
+
+# Metadata reads are memoised per (path, size, mtime), so reruns don't touch the files
+_wave_info_cache = {}
+_wave_info_lock = threading.Lock()
+
+
+# Function to read a wave's header (row count, variables, value labels) without loading data
+def read_wave_info(file):
+    file = Path(file).resolve()
+    stat = file.stat()
+    key = (str(file), stat.st_size, stat.st_mtime_ns)
+
+    with _wave_info_lock:
+        if key in _wave_info_cache:
+            return _wave_info_cache[key]
+
+    _, meta = pyreadstat.read_sav(str(file), metadataonly=True)
+    study, wave_date = parse_wave_name(file.name)
+    info = WaveInfo(
+        path=file,
+        study=study,
+        wave_date=wave_date,
+        row_count=meta.number_rows,
+        variables=list(meta.column_names),
+        value_labels=meta.variable_value_labels,
+    )
+
+    with _wave_info_lock:
+        # Drop entries for older versions of the same file
+        for old_key in [k for k in _wave_info_cache if k[0] == key[0]]:
+            del _wave_info_cache[old_key]
+        _wave_info_cache[key] = info
+    return info
+
+
+# Function to list every wave in a directory, oldest first (undated waves go last).
+# Waves still arriving, or seen for the first time, are left out until they have
+# settled (see wave_has_arrived). Returns the catalog and a list of (file, error)
+# for files whose header can't be read.
+def build_wave_catalog(directory):
+    catalog = []
+    errors = []
+    for file in Path(directory).glob("*.sav"):
+        try:
+            if not wave_has_arrived(file):
+                continue
+            catalog.append(read_wave_info(file))
+        except Exception as e:
+            errors.append((file, e))
+
+    catalog.sort(key=lambda info: (info.wave_date is None, info.wave_date or date.min, info.name))
+    return catalog, errors
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from count_cube import CountCube
+from lru_cache import LRUCache
+from sav_loader import (
+    CACHE_DIRECTORY, CACHE_FORMAT_VERSION, prune_cache_files, read_cache_file, read_sav_chunks, wave_fingerprint,
+    write_cache_file,
+)
+from wave_catalog import read_wave_info
+from wave_store import code_tag
+
+# Per-wave count cubes are kept here (one small pickle per wave), so a wave's
+# partial aggregates are computed once, not once per process
+PARTIALS_DIRECTORY = CACHE_DIRECTORY / "partials"
+
+# How many merged cubes (one per wave selection) are kept
+MAX_MERGED_CUBES = 4
+
+# How many partial files (one per wave and settings) are kept on disk
+MAX_PARTIAL_FILES = int(os.environ.get("WAVE_PARTIAL_FILES", "256"))
+
+# Waves with more rows than this are counted chunk by chunk straight from the .sav
+# file (see sav_loader.read_sav_chunks) instead of being loaded whole
+STREAM_WAVE_ROWS = int(os.environ.get("STREAM_WAVE_ROWS", "500000"))
+
+
+# Function to write a partial (see write_cache_file) and drop the least recently
+# used ones
+def write_partial_file(cube, partial_file):
+    def write(temp_file):
+        with open(temp_file, "wb") as f:
+            pickle.dump(cube, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if write_cache_file(partial_file, write):
+        prune_cache_files(partial_file.parent, "*.pickle", MAX_PARTIAL_FILES)
+
+
+# Function to read a partial, or None if it is missing or unreadable
+def read_partial_file(partial_file):
+    def read(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    return read_cache_file(partial_file, read)
+
+
+# Partial aggregates per wave: a CountCube over that wave's prepared rows only.
+# Waves never change after delivery, so each partial is built once (keyed by the
+# file's name and content) and the cube for any set of waves is a merge of their
+# partials. A new quarter costs one partial; older quarters only need their
+# partials, never their rows, which are let go of as soon as the partial is built.
+class WavePartials:
+    def __init__(self, store, dimensions, columns):
+        self.store = store  # wave store whose partitions and clean-up are used
+        self.dimensions = list(dimensions)
+        self.columns = list(columns)
+        self._partials = {}  # file name -> (fingerprint, CountCube)
+        self._merged = LRUCache(MAX_MERGED_CUBES)  # (file name, fingerprint) of the waves -> merged CountCube
+        self._lock = threading.Lock()
+        # Held while partials are built, so the pipeline and a session missing the
+        # same partial don't both parse the wave (and release its rows under each other)
+        self._build_lock = threading.Lock()
+
+        # A change to the dimensions, columns or clean-up must not reuse old partials,
+        # nor must a change to CountCube itself (the partials are pickled instances)
+        settings = f"v{CACHE_FORMAT_VERSION}|{self.dimensions}|{self.columns}|{store.prepare_tag}"
+        settings += f"|{code_tag(CountCube)}"
+        self._tag = hashlib.sha256(settings.encode("utf-8")).hexdigest()[:12]
+
+    def _partial_file(self, file, fingerprint):
+        # The wave's name is part of the key: it labels the wave inside the cube
+        name_tag = hashlib.sha256(file.name.encode("utf-8")).hexdigest()[:8]
+        return PARTIALS_DIRECTORY / f"{fingerprint}-{name_tag}-{self._tag}.pickle"
+
+    # Function to keep the given partials in memory, so they are found without disk
+    def _remember(self, partials, fingerprints):
+        with self._lock:
+            for file, partial in partials.items():
+                if partial is not None:
+                    self._partials[file.name] = (fingerprints[file], partial)
+
+    # Function to find a wave's partial in memory or on disk, or None
+    def _stored_partial(self, file, fingerprint):
+        with self._lock:
+            known = self._partials.get(file.name)
+        if known is not None and known[0] == fingerprint:
+            return known[1]
+        return read_partial_file(self._partial_file(file, fingerprint))
+
+    # Function to count a wave one chunk of rows at a time: each chunk is cleaned
+    # up and counted on its own and added to the running cube, so at most one chunk
+    # of the wave is ever in memory
+    def _stream_partial(self, file):
+        cube = None
+        for chunk in read_sav_chunks(file, self.store.columns):
+            chunk['source_file'] = pd.Series(file.name, index=chunk.index, dtype="category")
+            if self.store.prepare is not None:
+                chunk = self.store.prepare(chunk)
+            chunk_cube = CountCube(chunk, self.dimensions, self.columns)
+            cube = chunk_cube if cube is None else CountCube.merge([cube, chunk_cube])
+        return cube
+
+    # Function to build the partials of waves that have none yet. Large waves, and
+    # waves whose header doesn't say how large they are, are streamed; the others
+    # are loaded together (new waves are parsed in parallel), counted and released.
+    # Every partial built is persisted. Returns {file: CountCube} and a list of
+    # (file, error).
+    def _build_partials(self, sav_files, fingerprints):
+        built = {}
+        errors = []
+        loaded = []
+        for file in sav_files:
+            try:
+                row_count = read_wave_info(file).row_count
+                if row_count is not None and row_count <= STREAM_WAVE_ROWS:
+                    loaded.append(file)
+                    continue
+                built[file] = self._stream_partial(file)
+            except Exception as e:
+                errors.append((file, e))
+                continue
+            write_partial_file(built[file], self._partial_file(file, fingerprints[file]))
+
+        errors.extend(self.store.load(loaded))
+        failed = {file for file, _ in errors}
+        try:
+            for file in loaded:
+                if file in failed:
+                    continue
+                try:
+                    df = self.store.frame([file])
+                    if self.store.prepare is not None:
+                        df = self.store.prepare(df)
+                    built[file] = CountCube(df, self.dimensions, self.columns)
+                except Exception as e:
+                    errors.append((file, e))
+                    continue
+                write_partial_file(built[file], self._partial_file(file, fingerprints[file]))
+        finally:
+            self.store.release(loaded)
+        return built, errors
+
+    # Function to get the cube for a set of waves by merging their partials (built
+    # first for waves that have none). Returns (cube, list of (file, error)); the
+    # cube covers the waves that loaded and is None if none did. Its key identifies
+    # the data: the same waves with the same contents and settings give the same key.
+    def cube(self, sav_files):
+        sav_files = [Path(file) for file in sav_files]
+        errors = []
+        fingerprints = {}
+        for file in sav_files:
+            try:
+                fingerprints[file] = wave_fingerprint(file, CACHE_DIRECTORY)
+            except OSError as e:
+                errors.append((file, e))
+
+        partials = {file: self._stored_partial(file, fingerprint) for file, fingerprint in fingerprints.items()}
+        if any(partial is None for partial in partials.values()):
+            with self._build_lock:
+                # Someone else may have built them while we waited for the lock
+                for file, partial in partials.items():
+                    if partial is None:
+                        partials[file] = self._stored_partial(file, fingerprints[file])
+                missing = [file for file, partial in partials.items() if partial is None]
+                if missing:
+                    built, build_errors = self._build_partials(missing, fingerprints)
+                    self._remember(built, fingerprints)
+                    partials.update(built)
+                    errors.extend(build_errors)
+
+        loaded = [file for file in sav_files if partials.get(file) is not None]
+        self._remember(partials, fingerprints)
+        if not loaded:
+            return None, errors
+
+        key = tuple((file.name, fingerprints[file]) for file in loaded)
+        merged = self._merged.get(key)
+        if merged is None:
+            merged = CountCube.merge([partials[file] for file in loaded])
+            merged.key = hashlib.sha256(f"{self._tag}|{key}".encode("utf-8")).hexdigest()
+            self._merged.put(key, merged)
+        return merged, errors
+
+    # Watch service callback: forget the partial and any rows of a wave that went
+    # away (a changed wave gets a new fingerprint, so its old partial is never used)
+    def on_file_event(self, path, deleted=False):
+        if deleted:
+            with self._lock:
+                self._partials.pop(Path(path).name, None)
+            self.store.release([path])
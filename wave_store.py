@@ -0,0 +1,154 @@
+import hashlib
+import inspect
+import threading
+from pathlib import Path
+
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+from sav_loader import load_waves
+from wave_catalog import wave_has_arrived
+
+
+# Function to give each categorical column the same categories in every wave (first
+# seen first), so concatenating waves keeps them categorical instead of strings
+def unify_categories(parts):
+    categories = {}  # column -> categories in first-seen order (dict keys keep order)
+    for part in parts:
+        for column, dtype in part.dtypes.items():
+            if isinstance(dtype, CategoricalDtype):
+                categories.setdefault(column, {}).update(dict.fromkeys(dtype.categories))
+
+    # A column that is plain text in one wave but categorical in another keeps its values
+    for part in parts:
+        for column, labels in categories.items():
+            if column in part and not isinstance(part[column].dtype, CategoricalDtype):
+                labels.update(dict.fromkeys(part[column].dropna().unique()))
+
+    unified = []
+    for part in parts:
+        dtypes = {}
+        for column, labels in categories.items():
+            if column not in part:
+                continue
+            dtype = CategoricalDtype(list(labels))
+            if part[column].dtype != dtype:
+                dtypes[column] = dtype
+        unified.append(part.astype(dtypes) if dtypes else part)
+    return unified
+
+
+# Function to fingerprint clean-up code: the source of the given functions and of
+# every function they use from their modules (followed recursively), plus the value
+# of every plain constant they use, such as the question registry. A change to a
+# helper like encode_checkboxes then gives a new tag, not just a change to prepare.
+def code_tag(*functions):
+    digest = hashlib.sha256()
+    pending = [function for function in functions if function is not None]
+    seen = set()
+    while pending:
+        function = pending.pop(0)
+        if function in seen:
+            continue
+        seen.add(function)
+        try:
+            digest.update(inspect.getsource(function).encode("utf-8"))
+        except (OSError, TypeError):
+            digest.update(getattr(function, "__qualname__", repr(function)).encode("utf-8"))
+        if not inspect.isfunction(function):
+            continue
+
+        # Names used by the function and by the comprehensions and lambdas inside it
+        names = set()
+        codes = [function.__code__]
+        while codes:
+            code = codes.pop()
+            names.update(code.co_names)
+            codes.extend(const for const in code.co_consts if inspect.iscode(const))
+        for name in sorted(names):
+            value = function.__globals__.get(name)
+            if inspect.isfunction(value):
+                pending.append(value)
+            elif isinstance(value, (str, int, float, tuple, list, dict)):
+                digest.update(f"|{name}={value!r}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+# Holds every loaded wave as its own partition (one DataFrame per .sav file), so a
+# changed or new file only costs a re-parse of that one file
+class WaveStore:
+    def __init__(self, columns=None, workers=None, prepare=None):
+        self.columns = columns
+        self.workers = workers
+        self.prepare = prepare  # clean-up applied to a wave's rows before they are counted
+        self._partitions = {}  # file name -> DataFrame with a source_file column
+        self._stats = {}  # file name -> (size, mtime) the partition was loaded from
+        self._lock = threading.Lock()
+
+        # Changing the clean-up code (or how waves are combined) must not serve
+        # aggregates counted after the old code
+        self.prepare_tag = code_tag(prepare, unify_categories)
+
+    # Stat key used to notice files that changed without a watchdog event
+    @staticmethod
+    def _stat_key(file):
+        stat = Path(file).stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def _store(self, file, df, stat_key):
+        # file.name gives the basename of the file; stored as a category like the answers
+        df['source_file'] = pd.Series(file.name, index=df.index, dtype="category")
+        with self._lock:
+            self._partitions[file.name] = df
+            self._stats[file.name] = stat_key
+
+    # Function to make sure the given files are loaded; only missing or changed
+    # waves are read, and only once they have finished arriving. Returns a list of
+    # (file, error) for waves that failed to load or are still being copied in.
+    def load(self, sav_files):
+        sav_files = [Path(file) for file in sav_files]
+        stale = []
+        stat_keys = {}
+        errors = []
+        for file in sav_files:
+            try:
+                stat_keys[file] = self._stat_key(file)
+            except OSError as e:
+                errors.append((file, e))
+                continue
+            with self._lock:
+                if self._stats.get(file.name) == stat_keys[file]:
+                    continue
+            try:
+                if wave_has_arrived(file):
+                    stale.append(file)
+                else:
+                    errors.append((file, OSError(f"{file.name} is still being copied in")))
+            except OSError as e:
+                errors.append((file, e))
+
+        for file, df, error in load_waves(stale, workers=self.workers, columns=self.columns):
+            if error is not None:
+                errors.append((file, error))
+            else:
+                self._store(file, df, stat_keys[file])
+        return errors
+
+    # Function to let go of the rows of the given waves, e.g. once their partial
+    # aggregates are built or their files are gone. A later load() reads them
+    # again, from the Parquet cache.
+    def release(self, sav_files):
+        with self._lock:
+            for file in sav_files:
+                self._partitions.pop(Path(file).name, None)
+                self._stats.pop(Path(file).name, None)
+
+    # Function to build the combined dataset from the partitions of the given files.
+    # Every file must have been loaded (and not released since), else LookupError.
+    def frame(self, sav_files):
+        with self._lock:
+            missing = [Path(f).name for f in sav_files if Path(f).name not in self._partitions]
+            parts = [self._partitions[Path(f).name] for f in sav_files if Path(f).name in self._partitions]
+        if missing:
+            raise LookupError(f"Waves not loaded: {', '.join(missing)}")
+        return pd.concat(unify_categories(parts)) if parts else pd.DataFrame()